@@ -1,7 +1,11 @@
-from wagtail_modeladmin.options import ModelAdmin, modeladmin_register
-from .models import ContactFormSubmission
+from datetime import datetime
+
+from wagtail_modeladmin.options import ModelAdmin, ModelAdminGroup, modeladmin_register
+from wagtail_modeladmin.views import IndexView
+from .models import ArchivedContactFormSubmission, ContactFormSubmission
 from django.contrib import messages
-from wagtail_modeladmin.helpers import ButtonHelper
+from django.db.models import Q
+from wagtail_modeladmin.helpers import ButtonHelper, PermissionHelper
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
@@ -22,12 +26,141 @@ class ContactFormButtonHelper(ButtonHelper):
         }
     def add_button(self, classnames_add=None, classnames_exclude=None):
         return None  # Returning None will hide the "Add" button
+
+
+class KeysetIndexView(IndexView):
+    """
+    A listing newest first that pages with a (created_at, id) cursor instead
+    of page numbers, so each page is one index range scan however far back
+    it is, and nothing is counted.
+    """
+    AFTER_VAR = "after"
+    BEFORE_VAR = "before"
+    IGNORED_PARAMS = IndexView.IGNORED_PARAMS + (AFTER_VAR, BEFORE_VAR)
+    # The order is fixed to the index the cursor follows
+    sortable_by = ()
+
+    def get_ordering(self, request, queryset):
+        return ['-created_at', '-id']
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Filter and search links start again from the newest
+        params = {self.AFTER_VAR: None, self.BEFORE_VAR: None}
+        params.update(new_params or {})
+        return super().get_query_string(params, remove)
+
+    def get_cursor_link(self, var, obj):
+        return self.get_query_string({var: f"{obj.created_at.isoformat()},{obj.pk}"})
+
+    def parse_cursor(self, var):
+        created_at, _, pk = self.request.GET.get(var, '').rpartition(',')
+        try:
+            return datetime.fromisoformat(created_at), int(pk)
+        except ValueError:
+            return None
+
+    def get_page(self, queryset):
+        """The page of results and whether there are newer and older ones."""
+        size = self.items_per_page
+        before = self.parse_cursor(self.BEFORE_VAR)
+        if before:
+            created_at, pk = before
+            results = list(
+                queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+                .order_by('created_at', 'id')[:size + 1]
+            )
+            has_newer = len(results) > size
+            return results[:size][::-1], has_newer, True
+        after = self.parse_cursor(self.AFTER_VAR)
+        if after:
+            created_at, pk = after
+            # The first condition bounds the index scan, the second settles ties
+            queryset = queryset.filter(created_at__lte=created_at).filter(
+                Q(created_at__lt=created_at) | Q(id__lt=pk)
+            )
+        results = list(queryset[:size + 1])
+        return results[:size], bool(after), len(results) > size
+
+    def get_summary(self):
+        return ''
+
+    def get_context_data(self, **kwargs):
+        object_list, has_newer, has_older = self.get_page(self.queryset)
+        context = {
+            "view": self,
+            "all_count": self.get_base_queryset().exists(),
+            "object_list": object_list,
+            "summary": self.get_summary(),
+            "newer_url": self.get_cursor_link(self.BEFORE_VAR, object_list[0]) if has_newer and object_list else None,
+            "older_url": self.get_cursor_link(self.AFTER_VAR, object_list[-1]) if has_older and object_list else None,
+            "user_can_create": self.permission_helper.user_can_create(self.request.user),
+            "show_search": self.search_handler.show_search_form,
+        }
+        context.update(kwargs)
+        return super(IndexView, self).get_context_data(**context)
+
+
+class InboxIndexView(KeysetIndexView):
+    def get_summary(self):
+        # Counted from the partial index on the unanswered messages
+        count = ContactFormSubmission.objects.filter(responded=False).count()
+        return f"{count} awaiting a reply"
+
+
 class ContactFormSubmissionAdmin(ModelAdmin):
     model = ContactFormSubmission
-    menu_label = "Inbox"
+    menu_label = "Messages"
     menu_icon = "mail"
-    list_display = ('name', 'email', 'subject', 'created_at', 'responded')
+    list_display = ('name', 'email', 'subject', 'created_at', 'responded', 'reply_status')
+    list_filter = ('responded',)
+    # Answered by the trigram indexes on these fields
     search_fields = ('name', 'email', 'subject')
     button_helper_class = ContactFormButtonHelper  # Use the custom ButtonHelper
-# Register the ModelAdmin class with Wagtail
-modeladmin_register(ContactFormSubmissionAdmin)
\ No newline at end of file
+    index_view_class = InboxIndexView
+    index_template_name = 'modeladmin/base/keyset_index.html'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('replies')
+
+    def reply_status(self, obj):
+        # Replies are sent by the send_queued_email command, show how that went
+        replies = sorted(obj.replies.all(), key=lambda reply: reply.created_at)
+        if not replies:
+            return ''
+        reply = replies[-1]
+        if reply.status == reply.STATUS_FAILED:
+            return f"Failed: {reply.last_error}"
+        return reply.get_status_display_with_attempts()
+    reply_status.short_description = _("Reply")
+
+
+class ArchivePermissionHelper(PermissionHelper):
+    # Messages are archived by archive_contact_submissions only
+    def user_can_create(self, user):
+        return False
+
+    def user_can_edit_obj(self, user, obj):
+        return False
+
+
+class ArchivedContactFormSubmissionAdmin(ModelAdmin):
+    model = ArchivedContactFormSubmission
+    menu_label = "Archive"
+    menu_icon = "folder-inverse"
+    list_display = ('name', 'email', 'subject', 'created_at', 'archived_at')
+    # Not indexed, the archive is searched rarely
+    search_fields = ('email', 'subject')
+    inspect_view_enabled = True
+    permission_helper_class = ArchivePermissionHelper
+    index_view_class = KeysetIndexView
+    index_template_name = 'modeladmin/base/keyset_index.html'
+
+
+class InboxAdminGroup(ModelAdminGroup):
+    menu_label = "Inbox"
+    menu_icon = "mail"
+    items = (ContactFormSubmissionAdmin, ArchivedContactFormSubmissionAdmin)
+
+
+# Register the ModelAdmin classes with Wagtail
+modeladmin_register(InboxAdminGroup)
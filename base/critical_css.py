@@ -0,0 +1,204 @@
+"""
+Critical CSS: the rules of a page's stylesheet bundle that style what is
+shown above the fold, inlined in the <head> so the page paints before the
+full bundle (then loaded without blocking rendering) arrives.
+
+``manage.py generate_critical_css`` renders a live page of each of the
+PAGE_TYPES, keeps the header and the first section of its content as the
+part above the fold, and writes the rules matching it to
+critical/<page type>.css in the project's static files. Each file records
+the hash of the bundle it was made from, collectstatic warns when the
+bundle has changed since.
+"""
+import hashlib
+import logging
+import os
+import posixpath
+import re
+
+import rcssmin
+import tinycss2
+from bs4 import BeautifulSoup
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+from soupsieve import SelectorSyntaxError
+
+from . import static_bundles
+
+logger = logging.getLogger(__name__)
+
+CRITICAL_DIR = 'critical'
+
+# Page type: model (app_label.model_name) of the pages it is made from
+PAGE_TYPES = {
+    'home': 'home.homepage',
+    'about': 'base.aboutpage',
+    'blog_index': 'blog.blogindex',
+    'article': 'blog.blogandnewsarticle',
+    'contact': 'base.contactus',
+    'donate': 'base.donatepage',
+    'volunteer': 'base.volunteerjoinpage',
+}
+
+# Number of elements after the header considered above the fold
+FOLD_ELEMENTS = 1
+
+# Rules for interactions can wait for the full stylesheet
+DYNAMIC_PSEUDO_CLASS_RE = re.compile(r':(?:hover|focus|focus-within|focus-visible|active|visited|target)\b')
+PSEUDO_ELEMENT_RE = re.compile(r'::?(?:before|after|first-letter|first-line|placeholder|selection|marker)\b')
+VENDOR_PSEUDO_RE = re.compile(r'::?-[a-z]+-')
+
+BUNDLE_LINK_RE = re.compile(rf'{static_bundles.BUNDLE_DIR}/(\w+)(?:\.[0-9a-f]{{12}})?\.css')
+HEADER_RE = re.compile(r'^/\*! critical css of bundle (\w+) ([0-9a-f]+) \*/')
+
+_css_cache = {}
+
+
+def get_path(page_type):
+    return f'{CRITICAL_DIR}/{page_type}.css'
+
+
+def get_page_type(page):
+    label = page._meta.label_lower
+    return next((page_type for page_type, model in PAGE_TYPES.items() if model == label), None)
+
+
+def get_bundle_hash(css):
+    return hashlib.md5(css.encode('utf-8')).hexdigest()[:12]
+
+
+def build_bundle(name):
+    """The CSS bundle, built from the source files (so without collectstatic)."""
+
+    def open_source(path):
+        return open(finders.find(path), 'rb')
+
+    return static_bundles.build(name, 'css', open_source)
+
+
+def get_fold_html(html):
+    """The page with only the header and the first elements of the content left in its body."""
+    soup = BeautifulSoup(html, 'html.parser')
+    header = soup.body.find('header', recursive=False)
+    kept = 0
+    for element in list(header.find_next_siblings() if header else soup.body.find_all(recursive=False)):
+        if element.name == 'script' or kept >= FOLD_ELEMENTS:
+            element.decompose()
+        else:
+            kept += 1
+    return soup
+
+
+def matches(soup, selector):
+    if DYNAMIC_PSEUDO_CLASS_RE.search(selector) or VENDOR_PSEUDO_RE.search(selector):
+        return False
+    selector = PSEUDO_ELEMENT_RE.sub('', selector).strip() or '*'
+    try:
+        return soup.select_one(selector) is not None
+    except (SelectorSyntaxError, NotImplementedError, ValueError):
+        return False
+
+
+def filter_rules(rules, soup):
+    """Serialized CSS of the rules (and @media/@supports blocks) applying to the soup."""
+    kept = []
+    for rule in rules:
+        if rule.type == 'qualified-rule':
+            selectors = tinycss2.serialize(rule.prelude).split(',')
+            if any(matches(soup, selector) for selector in selectors):
+                kept.append(rule.serialize())
+        elif rule.type == 'at-rule':
+            keyword = rule.lower_at_keyword
+            if keyword in ('import', 'font-face'):
+                kept.append(rule.serialize())
+            elif keyword in ('media', 'supports') and rule.content is not None:
+                inner = filter_rules(tinycss2.parse_rule_list(rule.content, skip_comments=True, skip_whitespace=True), soup)
+                if inner:
+                    kept.append(f'@{rule.at_keyword}{tinycss2.serialize(rule.prelude)}{{{inner}}}')
+    return ''.join(kept)
+
+
+def extract(html, css):
+    """The rules of ``css`` needed for the part of the page ``html`` above the fold."""
+    soup = get_fold_html(html)
+    rules = tinycss2.parse_stylesheet(css, skip_comments=True, skip_whitespace=True)
+    return rcssmin.cssmin(filter_rules(rules, soup))
+
+
+def get_bundle_name(html):
+    match = BUNDLE_LINK_RE.search(html)
+    return match.group(1) if match else None
+
+
+def generate(page_type, html):
+    """Return (path, content) of the critical CSS file for a rendered page of the page type."""
+    bundle_name = get_bundle_name(html)
+    bundle_css = build_bundle(bundle_name)
+    header = f'/*! critical css of bundle {bundle_name} {get_bundle_hash(bundle_css)} */\n'
+    return get_path(page_type), header + extract(html, bundle_css)
+
+
+def get_stale(bundles=None):
+    """
+    Page types whose critical CSS was made from an older version of its
+    bundle, ``bundles`` maps bundle names to their CSS if already built.
+    """
+    bundles = dict(bundles or {})
+    stale = []
+    for page_type in PAGE_TYPES:
+        path = finders.find(get_path(page_type))
+        if not path:
+            continue
+        with open(path, encoding='utf-8') as css_file:
+            match = HEADER_RE.match(css_file.readline())
+        if not match:
+            stale.append(page_type)
+            continue
+        bundle_name, bundle_hash = match.groups()
+        if bundle_name not in bundles:
+            bundles[bundle_name] = build_bundle(bundle_name)
+        if get_bundle_hash(bundles[bundle_name]) != bundle_hash:
+            stale.append(page_type)
+    return stale
+
+
+def absolute_urls(css, css_path):
+    """Inlined in a page, the url()s can't stay relative to the stylesheet."""
+    css_dir = posixpath.dirname(css_path)
+
+    def rewrite(match):
+        quote, url = match.groups()
+        if url.startswith(('/', '#', 'data:', 'http:', 'https:')):
+            return match.group(0)
+        path, hash_mark, fragment = url.partition('#')
+        path, query_mark, query = path.partition('?')
+        path = posixpath.normpath(posixpath.join(css_dir, path))
+        try:
+            url = static(path)
+        except ValueError:
+            # Not in the manifest of ManifestStaticFilesStorage
+            url = settings.STATIC_URL + path
+        return f'url({quote}{url}{query_mark}{query}{hash_mark}{fragment}{quote})'
+
+    return static_bundles.CSS_URL_RE.sub(rewrite, css)
+
+
+def get_css(page):
+    """The critical CSS to inline in the page, or an empty string if there's none for its type."""
+    page_type = get_page_type(page)
+    if page_type is None:
+        return ''
+    if page_type not in _css_cache or settings.DEBUG:
+        path = finders.find(get_path(page_type))
+        css = ''
+        if path:
+            with open(path, encoding='utf-8') as css_file:
+                css = absolute_urls(HEADER_RE.sub('', css_file.read()).strip(), get_path(page_type))
+        _css_cache[page_type] = css
+    return _css_cache[page_type]
+
+
+def get_output_dir():
+    """Where the command writes the files: the project's own static directory."""
+    return os.path.join(settings.STATICFILES_DIRS[0], CRITICAL_DIR)
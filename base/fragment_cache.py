@@ -0,0 +1,51 @@
+"""
+Cache of rendered snippet StreamFields, for the sections the home and about
+pages pull in from snippets.
+
+A fragment is keyed by the snippet, the field, a hash of the stored stream
+data and the current versions of the snippet's page cache tag and the global
+tag. Editing the snippet changes the hash and its tag version; publishing
+pages (linked page URLs) or changing images (renditions) changes the global
+version. See base/page_cache.py for the tag versions.
+
+A fragment showing an image without its renditions or placeholder (still
+queued, see base/responsive_images.py) is not cached, so it isn't kept
+that way once they are ready.
+"""
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from . import page_cache, responsive_images
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+
+def get_cache_key(snippet, field_name):
+    stream_value = getattr(snippet, field_name)
+    content = json.dumps(stream_value.get_prep_value(), cls=DjangoJSONEncoder, sort_keys=True)
+    tags = [page_cache.GLOBAL_TAG, page_cache.snippet_tag(snippet)]
+    versions = page_cache.get_tag_versions(tags)
+    raw = '|'.join([content] + [versions[tag] for tag in tags])
+    return 'fragment:%s:%s:%s:%s' % (
+        snippet._meta.label_lower, snippet.pk, field_name, hashlib.md5(raw.encode()).hexdigest()
+    )
+
+
+def render_stream(snippet, field_name):
+    """
+    Return the rendered StreamField ``field_name`` of ``snippet``. Blocks are
+    rendered without the page context, so the output is the same for every
+    visitor and page.
+    """
+    key = get_cache_key(snippet, field_name)
+    html = cache.get(key)
+    if html is None:
+        with responsive_images.recording_fallbacks() as fallbacks:
+            # Same output as {% include_block %} on each block, without StreamBlock's wrapper divs
+            html = '\n'.join(str(block.render_as_block()) for block in getattr(snippet, field_name))
+        if not fallbacks:
+            cache.set(key, html, FRAGMENT_TIMEOUT)
+    return html
@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from base.models import ContactFormSubmission
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the contact form messages that were responded to and are older than "
+        "--days out of the Inbox into the archive, a batch per transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=ContactFormSubmission.ARCHIVE_AFTER.days,
+            help=f"Archive messages received more than this many days ago "
+                 f"(default: {ContactFormSubmission.ARCHIVE_AFTER.days}).",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Messages moved per transaction (default: 500).",
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options["days"])
+        total = 0
+        while True:
+            moved = ContactFormSubmission.archive(before, options["batch_size"])
+            if not moved:
+                break
+            total += moved
+            self.stdout.write(f"{total} archived")
+        self.stdout.write(self.style.SUCCESS(f"{total} messages received before {before:%Y-%m-%d} archived."))
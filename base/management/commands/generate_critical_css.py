@@ -0,0 +1,52 @@
+import os
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from base import critical_css
+
+
+class Command(BaseCommand):
+    help = (
+        "Extract the above-the-fold CSS of each page type from a live page of that type, "
+        "to be inlined in its <head>. Run it when the templates or stylesheets change "
+        "(collectstatic warns when a stylesheet bundle changed), then collectstatic."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--page-type", action="append", dest="page_types", choices=list(critical_css.PAGE_TYPES),
+            help="Only this page type (can be given more than once).",
+        )
+        parser.add_argument(
+            "--check", action="store_true",
+            help="Only check that the critical CSS matches the current stylesheet bundles.",
+        )
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            stale = critical_css.get_stale()
+            if stale:
+                raise CommandError(f"Outdated critical CSS: {', '.join(stale)}. Run generate_critical_css.")
+            self.stdout.write(self.style.SUCCESS("The critical CSS is up to date."))
+            return
+
+        output_dir = critical_css.get_output_dir()
+        os.makedirs(output_dir, exist_ok=True)
+        for page_type in options["page_types"] or critical_css.PAGE_TYPES:
+            model = apps.get_model(critical_css.PAGE_TYPES[page_type])
+            page = model.objects.live().first()
+            if page is None:
+                self.stderr.write(f"{page_type}: no live {model._meta.verbose_name} to render, skipped")
+                continue
+            # Link the bundle rather than its files, to know which one the page uses
+            with override_settings(STATIC_BUNDLES_ENABLED=True):
+                response = page.specific.make_preview_request()
+            if response.status_code != 200:
+                self.stderr.write(f"{page_type}: {page.url_path} returned {response.status_code}, skipped")
+                continue
+            path, css = critical_css.generate(page_type, response.content.decode("utf-8"))
+            with open(os.path.join(output_dir, os.path.basename(path)), "w", encoding="utf-8") as css_file:
+                css_file.write(css)
+            self.stdout.write(f"{page_type}: {len(css.encode('utf-8')) // 1024} kB from {page.title!r}")
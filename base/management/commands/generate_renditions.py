@@ -0,0 +1,95 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from wagtail.images import get_image_model
+
+from base import renditions
+
+
+def generate_image_renditions(image_id, specs, profiles):
+    """Create the missing renditions and placeholder of one image. Runs in a worker process."""
+    image = get_image_model().objects.get(pk=image_id)
+    return renditions.generate_missing(image, specs, profiles)
+
+
+def close_connections():
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the missing renditions of every image for the filter specs used by the "
+        "templates, responsive image profiles and logos. Existing renditions are skipped, "
+        "so an interrupted run can simply be started again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count() or 1,
+            help="Number of worker processes (default: number of CPUs). 1 runs in this process.",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Only list the filter specs and count the missing renditions.",
+        )
+        parser.add_argument(
+            "--image", type=int, action="append", dest="image_ids",
+            help="Only this image id (can be given more than once).",
+        )
+
+    def handle(self, *args, **options):
+        specs, profiles = renditions.discover_specs()
+        self.stdout.write(f"{len(specs)} filter specs and {len(profiles)} responsive image profiles:")
+        for spec in specs:
+            self.stdout.write(f"  {spec}")
+        for profile in profiles:
+            self.stdout.write(f"  profile: {profile}")
+
+        images = get_image_model().objects.order_by("pk")
+        if options["image_ids"]:
+            images = images.filter(pk__in=options["image_ids"])
+
+        if options["dry_run"]:
+            missing = 0
+            for image in images.iterator():
+                image_missing = len(renditions.get_missing_specs(image, renditions.get_image_specs(image, specs, profiles)))
+                if image_missing and options["verbosity"] > 1:
+                    self.stdout.write(f"Image {image.pk} ({image.title}): {image_missing} missing")
+                missing += image_missing
+            self.stdout.write(self.style.SUCCESS(f"{missing} renditions would be generated."))
+            return
+
+        image_ids = list(images.values_list("pk", flat=True))
+        total = len(image_ids)
+        created = failed = 0
+        if options["workers"] > 1:
+            close_connections()
+            with ProcessPoolExecutor(max_workers=options["workers"], initializer=close_connections) as pool:
+                futures = {
+                    pool.submit(generate_image_renditions, image_id, specs, profiles): image_id
+                    for image_id in image_ids
+                }
+                results = ((futures[future], future) for future in as_completed(futures))
+                for done, (image_id, future) in enumerate(results, 1):
+                    created, failed = self.report(done, total, image_id, future.result, created, failed)
+        else:
+            for done, image_id in enumerate(image_ids, 1):
+                created, failed = self.report(
+                    done, total, image_id, lambda: generate_image_renditions(image_id, specs, profiles), created, failed
+                )
+
+        style = self.style.ERROR if failed else self.style.SUCCESS
+        self.stdout.write(style(f"Generated {created} renditions and placeholders for {total} images, {failed} failed."))
+
+    def report(self, done, total, image_id, get_result, created, failed):
+        try:
+            count = get_result()
+        except Exception as e:
+            # A broken upload shouldn't stop the run
+            self.stderr.write(f"[{done}/{total}] Image {image_id}: {e}")
+            return created, failed + 1
+        self.stdout.write(f"[{done}/{total}] Image {image_id}: {count} renditions and placeholders generated")
+        return created + count, failed
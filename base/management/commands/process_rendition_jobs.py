@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from base import page_cache, renditions
+from base.models import RenditionJob, SiteSettings
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the renditions queued on image upload, on publish and by pages showing "
+        "images whose renditions are missing. Runs until stopped, or until the queue is "
+        "empty with --once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty.")
+        parser.add_argument(
+            "--interval", type=float, default=5,
+            help="Seconds to wait before checking an empty queue again (default: 5).",
+        )
+
+    def handle(self, *args, **options):
+        specs, profiles = renditions.discover_specs()
+        while True:
+            created = 0
+            while (job_result := self.process_next_job(specs, profiles)) is not None:
+                created += job_result
+            if created:
+                # Pages, fragments and logos cached while the renditions or placeholders
+                # were missing show the originals
+                page_cache.invalidate(page_cache.GLOBAL_TAG)
+                SiteSettings.clear_cache()
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
+
+    def process_next_job(self, specs, profiles):
+        """
+        Process the oldest job, return the number of renditions and placeholders
+        created, or None if there are no jobs left.
+        """
+        with transaction.atomic():
+            # Several workers can share the queue, each job is locked by the one processing it
+            job = (
+                RenditionJob.objects.select_for_update(skip_locked=True)
+                .filter(attempts__lt=RenditionJob.MAX_ATTEMPTS)
+                .first()
+            )
+            if job is None:
+                return None
+            try:
+                with transaction.atomic():
+                    created = renditions.process_job(job, specs, profiles)
+            except Exception as e:
+                job.attempts += 1
+                job.last_error = str(e)
+                job.save(update_fields=["attempts", "last_error"])
+                self.stderr.write(f"{job}: {e}")
+                return 0
+            job.delete()
+        self.stdout.write(f"{job}: {created} renditions and placeholders generated")
+        return created
@@ -0,0 +1,66 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from base.models import OutgoingEmail
+
+
+class Command(BaseCommand):
+    help = (
+        "Send the queued emails (such as the replies to contact form submissions) through "
+        "one connection to the mail server per batch, retrying failures later. Runs until "
+        "stopped, or until no email is due with --once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit once no email is due.")
+        parser.add_argument(
+            "--interval", type=float, default=10,
+            help="Seconds to wait before checking for due emails again (default: 10).",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=50,
+            help="Emails sent through one connection (default: 50).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            while self.send_batch(options["batch_size"]):
+                pass
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
+
+    def send_batch(self, batch_size):
+        """Send the next batch of due emails, return how many there were."""
+        with transaction.atomic():
+            # Several workers can share the queue, each batch is locked by the one sending it
+            emails = list(OutgoingEmail.get_due().select_for_update(skip_locked=True)[:batch_size])
+            if not emails:
+                return 0
+            connection = get_connection()
+            try:
+                connection.open()
+            except Exception as e:
+                # The mail server is unreachable, try the whole batch again later
+                for email in emails:
+                    email.mark_failed(e)
+                self.stderr.write(f"Could not connect to the mail server: {e}")
+                return len(emails)
+            try:
+                for email in emails:
+                    try:
+                        email.as_message(connection).send()
+                    except Exception as e:
+                        email.mark_failed(e)
+                        self.stderr.write(f"{email}: {e}")
+                        # Drop the connection, it may be broken; the next email opens a new one
+                        connection.close()
+                    else:
+                        email.mark_sent()
+                        self.stdout.write(f"{email}: sent")
+            finally:
+                connection.close()
+        return len(emails)
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-16 20:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0017_renditionjob'),
+        ('wagtailimages', '0026_delete_uploadedimage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImagePlaceholder',
+            fields=[
+                ('image', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='placeholder', serialize=False, to='wagtailimages.image')),
+                ('file_hash', models.CharField(blank=True, max_length=40)),
+                ('data_uri', models.TextField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.1 on 2026-10-16 21:20
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0019_outgoingemail'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='ArchivedContactFormSubmission',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('email', models.EmailField(max_length=254)),
+                ('subject', models.CharField(max_length=255)),
+                ('message', models.TextField()),
+                ('created_at', models.DateTimeField()),
+                ('response_message', models.TextField(blank=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'archived message',
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='contactformsubmission',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='contactformsubmission',
+            index=models.Index(fields=['-created_at', '-id'], name='contact_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactformsubmission',
+            index=models.Index(condition=models.Q(('responded', False)), fields=['-created_at', '-id'], name='contact_unreplied_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactformsubmission',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='contact_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactformsubmission',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('email'), name='gin_trgm_ops'), name='contact_email_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactformsubmission',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('subject'), name='gin_trgm_ops'), name='contact_subject_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedcontactformsubmission',
+            index=models.Index(fields=['-created_at', '-id'], name='archivedcontact_created_idx'),
+        ),
+    ]
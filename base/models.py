@@ -1,5 +1,16 @@
-from django.db import models
-from django.core.mail import send_mail
+import base64
+import uuid
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db import models, transaction
+from django.db.models.functions import Upper
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.utils import timezone
 # Create your models here.
 from wagtail.fields import RichTextField
 from wagtail.admin.panels import(
@@ -8,12 +19,14 @@ from wagtail.admin.panels import(
     FieldRowPanel,
 )
 from wagtail.images.blocks import ImageChooserBlock
+from wagtail.images.models import Filter
+from wagtail.images.utils import to_svg_safe_spec
 from wagtail.contrib.settings.models import (
     BaseGenericSetting,
     register_setting,
 )
 from modelcluster.fields import ParentalKey
-from wagtail.models import Page, Orderable
+from wagtail.models import Page, Orderable, Site
 from base.blocks import SimpleHeroBlock
 from wagtail.fields import StreamField
 class ReadOnlyPanel(FieldPanel):
@@ -79,6 +92,67 @@ class SiteSettings(BaseGenericSetting):
     )
     
     
+    # Renditions of each logo used by the site chrome (base.html, header and footer)
+    LOGO_RENDITIONS = {
+        'rectangle_logo': ['max-320x50'],
+        'square_logo': [],
+        'icon_logo': ['fill-32x32|format-png'],
+        'inverted_rectangle_logo': ['max-320x50'],
+    }
+    CACHE_VERSION_KEY = 'base:sitesettings:version'
+
+    select_related = list(LOGO_RENDITIONS) + ['donate_page']
+
+    @classmethod
+    def load(cls, request_or_site=None):
+        # Pages read the shared cached copy; the settings editor loads its own from the database
+        if request_or_site is None or isinstance(request_or_site, Site):
+            return super().load(request_or_site)
+        attr_name = cls.get_cache_attr_name()
+        if not hasattr(request_or_site, attr_name):
+            setattr(request_or_site, attr_name, cls.load_cached())
+        return getattr(request_or_site, attr_name)
+
+    @staticmethod
+    def load_cached():
+        """
+        Return the settings with logos, their renditions and the donate page
+        loaded, from a cache shared by all workers. The cache key carries a
+        version that clear_cache replaces, so a copy built from outdated data
+        while the settings were being saved is never read.
+        """
+        version = cache.get(SiteSettings.CACHE_VERSION_KEY)
+        if version is None:
+            cache.add(SiteSettings.CACHE_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+            version = cache.get(SiteSettings.CACHE_VERSION_KEY)
+        key = f'base:sitesettings:{version}'
+        site_settings = cache.get(key)
+        if site_settings is None:
+            site_settings = SiteSettings._get_or_create()
+            for field_name, filter_specs in SiteSettings.LOGO_RENDITIONS.items():
+                logo = getattr(site_settings, field_name)
+                if logo is None:
+                    continue
+                if logo.is_svg():
+                    # As the tags ask for them with preserve_svg
+                    filter_specs = [to_svg_safe_spec(spec) or 'original' for spec in filter_specs]
+                # Read by find_existing_renditions, so the {% image_rendition %} tags need no queries
+                if not filter_specs:
+                    logo.prefetched_renditions = []
+                elif getattr(settings, 'RENDITIONS_IN_BACKGROUND', False):
+                    # Missing ones are queued by the tags; process_rendition_jobs clears this cache
+                    logo.prefetched_renditions = list(
+                        logo.find_existing_renditions(*[Filter(spec) for spec in filter_specs]).values()
+                    )
+                else:
+                    logo.prefetched_renditions = list(logo.get_renditions(*filter_specs).values())
+            cache.set(key, site_settings, 60 * 60 * 24)
+        return site_settings
+
+    @staticmethod
+    def clear_cache():
+        cache.set(SiteSettings.CACHE_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
     panels = [
         MultiFieldPanel(
             [
@@ -184,6 +258,25 @@ class ContactFormSubmission(models.Model):
     response_message = models.TextField(blank=True, null=True)
     responded = models.BooleanField(default=False)
 
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # The Inbox listing, newest first (see InboxIndexView)
+            models.Index(fields=['-created_at', '-id'], name='contact_created_idx'),
+            # Messages awaiting a reply, a small part of the table
+            models.Index(
+                fields=['-created_at', '-id'], condition=models.Q(responded=False),
+                name='contact_unreplied_idx',
+            ),
+            # The Inbox search is UPPER(field) LIKE '%...%', which trigram indexes can answer
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='contact_name_trgm_idx'),
+            GinIndex(OpClass(Upper('email'), name='gin_trgm_ops'), name='contact_email_trgm_idx'),
+            GinIndex(OpClass(Upper('subject'), name='gin_trgm_ops'), name='contact_subject_trgm_idx'),
+        ]
+
+    # Responded messages older than this are moved to the archive by archive_contact_submissions
+    ARCHIVE_AFTER = timedelta(days=getattr(settings, 'CONTACT_ARCHIVE_AFTER_DAYS', 180))
+
     # Define the admin interface panels
     panels = [
         MultiFieldPanel([
@@ -201,23 +294,83 @@ class ContactFormSubmission(models.Model):
         return f"Message from {self.name}"
     
     def save(self, *args, **kwargs):
-        # If there is a response message, mark the submission as responded
-        if self.response_message and not self.responded:
+        # If there is a response message, mark the submission as responded and send it
+        send_response = bool(self.response_message and not self.responded)
+        if send_response:
             self.responded = True
-        super().save(*args, **kwargs)
+        # Marked as responded only together with its reply queued
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if send_response:
+                self.send_response()
 
     def send_response(self):
-        """Send an email response to the client."""
+        """
+        Queue the email response to the client. It's sent by the send_queued_email
+        command, so the admin doesn't wait for the mail server.
+        """
         if self.response_message:
-            send_mail(
+            OutgoingEmail.objects.create(
+                submission=self,
+                to=self.email,
                 subject=f"Re: {self.subject}",
-                message=self.response_message,
-                from_email='info@passion4health.org',  # Replace with your sender email
-                recipient_list=[self.email],
-                fail_silently=False,
+                body=self.response_message,
             )
-            self.responded = True
-            self.save()
+
+    @staticmethod
+    def archive(before, batch_size=500):
+        """
+        Move a batch of the messages responded to before ``before`` (by date
+        received) into ArchivedContactFormSubmission, return how many moved.
+        """
+        with transaction.atomic():
+            submissions = list(
+                ContactFormSubmission.objects.filter(responded=True, created_at__lt=before)
+                .order_by('created_at', 'id')
+                .select_for_update(skip_locked=True)[:batch_size]
+            )
+            if not submissions:
+                return 0
+            ArchivedContactFormSubmission.objects.bulk_create([
+                ArchivedContactFormSubmission(
+                    id=submission.id,
+                    name=submission.name,
+                    email=submission.email,
+                    subject=submission.subject,
+                    message=submission.message,
+                    created_at=submission.created_at,
+                    response_message=submission.response_message or '',
+                )
+                for submission in submissions
+            ])
+            # Their queued or sent replies are kept, unlinked
+            ContactFormSubmission.objects.filter(pk__in=[submission.pk for submission in submissions]).delete()
+        return len(submissions)
+
+
+class ArchivedContactFormSubmission(models.Model):
+    """
+    A responded contact form message moved out of the Inbox table, keeping
+    its id, by the archive_contact_submissions command.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    name = models.CharField(max_length=255)
+    email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    created_at = models.DateTimeField()
+    response_message = models.TextField(blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='archivedcontact_created_idx'),
+        ]
+        verbose_name = "archived message"
+
+    def __str__(self):
+        return f"Message from {self.name}"
     
 class ContactUs(Page):
     hero_block = StreamField(
@@ -303,4 +456,156 @@ class VolunteerJoinPage(Page):
         FieldPanel("form_link"),
         FieldPanel("button_text"),
     ]
-    
\ No newline at end of file
+    
+
+class RenditionJob(models.Model):
+    """
+    An image, or a page or snippet using images, whose renditions are still
+    to be generated. Processed outside of requests by the
+    process_rendition_jobs command.
+    """
+    content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE, related_name='+')
+    object_id = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    # Jobs that failed this many times are left for a person to look at
+    MAX_ATTEMPTS = 3
+
+    class Meta:
+        ordering = ['created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'object_id'], name='unique_rendition_job'),
+        ]
+
+    def __str__(self):
+        return f"Renditions for {self.content_type.model} {self.object_id}"
+
+    @staticmethod
+    def enqueue(obj, retry_failed=True):
+        """
+        Queue the object's renditions. A job that already failed MAX_ATTEMPTS
+        times is given new attempts unless ``retry_failed`` is False.
+        """
+        lookup = {'content_type': ContentType.objects.get_for_model(obj), 'object_id': str(obj.pk)}
+        if retry_failed:
+            RenditionJob.objects.update_or_create(**lookup, defaults={'attempts': 0, 'last_error': ''})
+        else:
+            RenditionJob.objects.get_or_create(**lookup)
+
+
+class ImagePlaceholder(models.Model):
+    """
+    A tiny, blurry WebP version of an image as a data URI, painted while the
+    image itself loads. Made by the rendition jobs, see base/renditions.py.
+    """
+    image = models.OneToOneField(
+        'wagtailimages.Image', on_delete=models.CASCADE, primary_key=True, related_name='placeholder'
+    )
+    # Hash of the image file the placeholder was made from
+    file_hash = models.CharField(max_length=40, blank=True)
+    data_uri = models.TextField()
+
+    WIDTH = 16
+    QUALITY = 40
+
+    def __str__(self):
+        return f"Placeholder for {self.image}"
+
+    @staticmethod
+    def is_current(image):
+        placeholder = getattr(image, 'placeholder', None)
+        return placeholder is not None and placeholder.file_hash == image.file_hash
+
+    @staticmethod
+    def generate(image):
+        """Create or refresh the placeholder of a (non-SVG) image."""
+        width = ImagePlaceholder.WIDTH
+        height = max(1, round(width * image.height / image.width))
+        output = BytesIO()
+        with image.get_willow_image() as willow_image:
+            willow_image.auto_orient().resize((width, height)).save_as_webp(output, quality=ImagePlaceholder.QUALITY)
+        data_uri = 'data:image/webp;base64,' + base64.b64encode(output.getvalue()).decode()
+        placeholder, created = ImagePlaceholder.objects.update_or_create(
+            image=image, defaults={'file_hash': image.file_hash, 'data_uri': data_uri}
+        )
+        return placeholder
+
+
+class OutgoingEmail(models.Model):
+    """
+    An email waiting to be sent, or sent, by the send_queued_email command.
+    Failed sends are retried with an increasing delay.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    submission = models.ForeignKey(
+        ContactFormSubmission, null=True, blank=True, on_delete=models.SET_NULL, related_name='replies'
+    )
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    # Emails that failed this many times are left for a person to look at
+    MAX_ATTEMPTS = 5
+    # Delay before the first retry, multiplied by 4 after each failure
+    RETRY_DELAY = timedelta(minutes=1)
+
+    class Meta:
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outgoingemail_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {self.to}"
+
+    def get_status_display_with_attempts(self):
+        if self.status == self.STATUS_QUEUED and self.attempts:
+            return f"Retrying ({self.attempts} failed)"
+        return self.get_status_display()
+
+    def as_message(self, connection=None):
+        return EmailMessage(
+            subject=self.subject,
+            body=self.body,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[self.to],
+            connection=connection,
+        )
+
+    def mark_sent(self):
+        self.status = self.STATUS_SENT
+        self.sent_at = timezone.now()
+        self.last_error = ''
+        self.save(update_fields=['status', 'sent_at', 'last_error'])
+
+    def mark_failed(self, error):
+        """Record a failed attempt and schedule the next one, if any."""
+        self.attempts += 1
+        self.last_error = str(error)
+        if self.attempts >= self.MAX_ATTEMPTS:
+            self.status = self.STATUS_FAILED
+        else:
+            self.next_attempt_at = timezone.now() + self.RETRY_DELAY * 4 ** (self.attempts - 1)
+        self.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+    @staticmethod
+    def get_due():
+        return OutgoingEmail.objects.filter(
+            status=OutgoingEmail.STATUS_QUEUED, next_attempt_at__lte=timezone.now()
+        )
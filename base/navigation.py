@@ -0,0 +1,82 @@
+"""
+Site navigation menu, built once per site and kept in the shared cache.
+
+The cached structure only holds titles and URLs; which item is active is
+worked out per request by get_menu. base/signals.py calls invalidate when
+pages are published, unpublished, moved or deleted and when sites change.
+"""
+import uuid
+
+from django.core.cache import cache
+from wagtail.models import Page
+
+# Levels of pages below the site root included in the menu
+MENU_DEPTH = 2
+
+VERSION_KEY = 'navigation:version'
+
+
+def _get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate():
+    cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def _menu_item(page, site):
+    return {'id': page.pk, 'title': page.title, 'url': page.relative_url(site), 'children': []}
+
+
+def build_menu(site):
+    """Return the site root and the live in-menu pages below it, as nested dicts."""
+    root_page = site.root_page
+    menu = _menu_item(root_page, site)
+    items_by_path = {root_page.path: menu}
+    pages = (
+        Page.objects.live().in_menu()
+        .descendant_of(root_page)
+        .filter(depth__lte=root_page.depth + MENU_DEPTH)
+        .order_by('path')
+    )
+    for page in pages:
+        parent = items_by_path.get(page.path[:-Page.steplen])
+        if parent is None:
+            continue  # Below a page that is not in the menu
+        item = _menu_item(page, site)
+        parent['children'].append(item)
+        items_by_path[page.path] = item
+    return menu
+
+
+def get_cached_menu(site):
+    key = f'navigation:menu:{site.pk}:{_get_version()}'
+    menu = cache.get(key)
+    if menu is None:
+        menu = build_menu(site)
+        cache.set(key, menu, 60 * 60 * 24)
+    return menu
+
+
+def _mark_active(item, path):
+    url = item['url']
+    children = [_mark_active(child, path) for child in item['children']]
+    current = path == url
+    return {
+        **item,
+        'children': children,
+        'current': current,
+        'active': current or (url != '/' and path.startswith(url)) or any(child['active'] for child in children),
+    }
+
+
+def get_menu(site, path):
+    """
+    Return the cached menu of the site. ``current`` is set on the item for
+    ``path`` and ``active`` on it and every item leading to it.
+    """
+    return _mark_active(get_cached_menu(site), path)
@@ -0,0 +1,217 @@
+"""
+Full-response cache for anonymous visits to Wagtail pages.
+
+Every cached response records the dependency tags it was rendered from
+(the page itself, the snippets it embeds and the site-wide "all" tag) along
+with the version of each tag at render time. Invalidating a tag just gives
+it a new version, so every response that depends on it is treated as a miss
+the next time it is requested. See base/signals.py for what invalidates what.
+
+The same versions are the validators for conditional GETs: the ETag is a
+hash of them and Last-Modified is the time of the newest one.
+
+Versions are kept in their own cache (PAGE_CACHE_VERSIONS_ALIAS), so culling
+the responses never evicts them. Requests with free-text query values
+(a search) are not cached, as there is no end to them.
+"""
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import models
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers, quote_etag
+from django.utils.http import http_date
+from wagtail.snippets.models import get_snippet_models
+
+# Changes to the page tree, site settings or images can show up on any page
+GLOBAL_TAG = 'all'
+
+# Query parameters that change what a page renders; any others are ignored
+DEFAULT_QUERY_PARAMS = ['page', 'tag', 'search', 'comments', 'after', 'before', 'format']
+# Query parameters taking free text; pages rendered for them aren't cached
+DEFAULT_UNCACHED_QUERY_PARAMS = ['search']
+
+
+def get_cache():
+    return caches[getattr(settings, 'PAGE_CACHE_ALIAS', 'default')]
+
+
+def get_version_cache():
+    return caches[getattr(settings, 'PAGE_CACHE_VERSIONS_ALIAS', 'default')]
+
+
+def page_tag(page_id):
+    return f'page:{page_id}'
+
+
+def snippet_tag(instance):
+    return f'snippet:{instance._meta.label_lower}:{instance.pk}'
+
+
+def _version_key(tag):
+    return f'pagecache:version:{tag}'
+
+
+def _new_version():
+    # "<unix time>.<random>", the time part is used for Last-Modified
+    return f'{int(time.time())}.{uuid.uuid4().hex}'
+
+
+def get_tag_versions(tags):
+    """Return the current version of each tag, creating the missing ones."""
+    cache = get_version_cache()
+    keys = {_version_key(tag): tag for tag in tags}
+    found = cache.get_many(keys.keys())
+    versions = {keys[key]: version for key, version in found.items()}
+    for key, tag in keys.items():
+        if tag not in versions:
+            # A fresh random version also covers a version evicted from the cache
+            cache.add(key, _new_version(), timeout=None)
+            versions[tag] = cache.get(key)
+    return versions
+
+
+def invalidate(*tags):
+    get_version_cache().set_many({_version_key(tag): _new_version() for tag in tags}, timeout=None)
+
+
+def get_validators(key, dependencies):
+    """Return the ETag and Last-Modified timestamp for a response."""
+    raw = key + '|' + '|'.join(f'{tag}={version}' for tag, version in sorted(dependencies.items()))
+    etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+    last_modified = max(int(version.partition('.')[0]) for version in dependencies.values())
+    return etag, last_modified
+
+
+def not_modified_response(request, key, dependencies):
+    """Return a 304 response, with its validators, if the visitor's copy is still current."""
+    etag, last_modified = get_validators(key, dependencies)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validator_headers(response, key, dependencies)
+    return response
+
+
+def set_validator_headers(response, key, dependencies):
+    etag, last_modified = get_validators(key, dependencies)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+
+
+def get_dependencies(page):
+    """Tags a rendering of this page depends on, including every snippet it links to."""
+    tags = {GLOBAL_TAG, page_tag(page.pk)}
+    snippet_models = tuple(get_snippet_models())
+    for field in page._meta.get_fields():
+        if not field.is_relation or not issubclass(field.related_model or object, snippet_models):
+            continue
+        if isinstance(field, models.ForeignKey):
+            snippet_id = getattr(page, field.attname)
+            if snippet_id is not None:
+                tags.add(f'snippet:{field.related_model._meta.label_lower}:{snippet_id}')
+        elif isinstance(field, models.ManyToManyField):
+            for snippet in getattr(page, field.name).all():
+                tags.add(snippet_tag(snippet))
+    return tags
+
+
+def is_cacheable_request(request):
+    if request.method != 'GET':
+        return False
+    uncached_params = getattr(settings, 'PAGE_CACHE_UNCACHED_QUERY_PARAMS', DEFAULT_UNCACHED_QUERY_PARAMS)
+    if any(request.GET.get(name) for name in uncached_params):
+        return False
+    # Anything with a session may be a logged-in editor; leave the session untouched
+    return settings.SESSION_COOKIE_NAME not in request.COOKIES
+
+
+def is_cacheable_response(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')  # Page embeds a per-visitor CSRF token
+        and 'private' not in response.get('Cache-Control', '')
+        and 'no-cache' not in response.get('Cache-Control', '')
+    )
+
+
+def get_cache_key(request):
+    query_params = getattr(settings, 'PAGE_CACHE_QUERY_PARAMS', DEFAULT_QUERY_PARAMS)
+    query = sorted(
+        (name, value)
+        for name in query_params
+        for value in request.GET.getlist(name)
+    )
+    raw = f'{request.get_host()}|{request.path}|{query}'
+    return 'pagecache:response:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def set_shared_cache_headers(response):
+    # Logged-in editors get the userbar, so the page differs for them
+    patch_vary_headers(response, ['Cookie'])
+    patch_cache_control(response, public=True, s_maxage=getattr(settings, 'PAGE_CACHE_SHARED_MAX_AGE', 300))
+
+
+def get_cached_response(request, key):
+    entry = get_cache().get(key)
+    if entry is None:
+        return None
+    dependencies = entry['dependencies']
+    if get_tag_versions(dependencies) != dependencies:
+        return None
+    response = not_modified_response(request, key, dependencies)
+    if response is None:
+        response = HttpResponse(entry['content'], status=entry['status'])
+        for header, value in entry['headers'].items():
+            response[header] = value
+    set_validator_headers(response, key, dependencies)
+    set_shared_cache_headers(response)
+    response['X-Page-Cache'] = 'hit'
+    return response
+
+
+def store_response(key, dependencies, response):
+    entry = {
+        'content': response.content,
+        'status': response.status_code,
+        'headers': dict(response.items()),
+        'dependencies': dependencies,
+    }
+    get_cache().set(key, entry, getattr(settings, 'PAGE_CACHE_TIMEOUT', 600))
+    set_shared_cache_headers(response)
+    response['X-Page-Cache'] = 'miss'
+
+
+class PageCacheMiddleware:
+    """Serve anonymous GET requests for Wagtail pages from the page cache."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'PAGE_CACHE_ENABLED', True) or not is_cacheable_request(request):
+            return self.get_response(request)
+
+        key = get_cache_key(request)
+        response = get_cached_response(request, key)
+        if response is not None:
+            return response
+
+        request.page_cache_key = key
+        response = self.get_response(request)
+        # Set by the before_serve_page hook, read before the page was rendered so
+        # that an invalidation during rendering is not lost
+        dependencies = getattr(request, 'page_cache_dependencies', None)
+        if dependencies is None:
+            return response
+        if response.status_code == 304:
+            # From the before_serve_page hook, validators included; same caching headers as a hit
+            set_shared_cache_headers(response)
+        elif is_cacheable_response(request, response):
+            set_validator_headers(response, key, dependencies)
+            store_response(key, dependencies, response)
+        return response
@@ -0,0 +1,144 @@
+"""
+The image renditions the site's templates ask for, so they can be generated
+ahead of the first visitor instead of while rendering a page: in bulk by the
+generate_renditions command, or through the RenditionJob queue processed by
+the process_rendition_jobs command.
+
+Filter specs come from the {% image %}/{% picture %}/{% srcset_image %} and
+{% image_rendition %} tags in the project's templates, the responsive image
+profiles and the logo renditions of SiteSettings.
+"""
+import os
+import re
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.template.utils import get_app_template_dirs
+from wagtail.images import get_image_model
+from wagtail.images.models import Filter
+from wagtail.models import ReferenceIndex
+from wagtail.snippets.models import get_snippet_models
+from wagtail.images.utils import to_svg_safe_spec
+
+from . import responsive_images
+
+IMAGE_TAG_RE = re.compile(r'\{%\s*(image|picture|srcset_image|image_rendition)\s+\S+\s+(.*?)\s*%\}')
+
+
+def get_template_dirs():
+    """Template directories of the project itself, not those of installed packages."""
+    dirs = [directory for engine in settings.TEMPLATES for directory in engine.get('DIRS', [])]
+    dirs += [str(directory) for directory in get_app_template_dirs('templates')]
+    base_dir = str(settings.BASE_DIR)
+    return [directory for directory in dirs if os.path.abspath(directory).startswith(base_dir)]
+
+
+def parse_image_tag(tag_name, arguments):
+    """Return the filter specs of a single image tag."""
+    specs = []
+    for bit in arguments.split():
+        if bit == 'as':
+            break
+        if '=' in bit or bit == 'preserve-svg':
+            continue
+        specs.append(bit.strip('"\''))
+    if not specs:
+        return []
+    if tag_name in ('image', 'image_rendition'):
+        return ['|'.join(specs)]
+    return Filter.expand_spec(specs)
+
+
+def discover_template_specs():
+    specs = set()
+    for directory in get_template_dirs():
+        for dirpath, dirnames, filenames in os.walk(directory):
+            for filename in filenames:
+                if not filename.endswith(('.html', '.txt', '.xml')):
+                    continue
+                with open(os.path.join(dirpath, filename), encoding='utf-8') as template_file:
+                    for tag_name, arguments in IMAGE_TAG_RE.findall(template_file.read()):
+                        specs.update(parse_image_tag(tag_name, arguments))
+    return specs
+
+
+def discover_specs():
+    """
+    All filter specs used by the site. Responsive profiles are returned by
+    name (see get_image_specs), since their specs depend on the image.
+    """
+    from .models import SiteSettings
+
+    specs = discover_template_specs()
+    for logo_specs in SiteSettings.LOGO_RENDITIONS.values():
+        specs.update(logo_specs)
+    return sorted(specs), sorted(settings.RESPONSIVE_IMAGE_PROFILES)
+
+
+def get_image_specs(image, specs, profiles):
+    """The filter specs to generate for this image."""
+    if image.is_svg():
+        # SVGs are shown as they are by responsive_image, and can't be converted to other formats
+        return sorted({to_svg_safe_spec(spec) or 'original' for spec in specs})
+    image_specs = list(specs)
+    fallback_format = responsive_images.get_fallback_format(image)
+    for profile in profiles:
+        image_specs += responsive_images.get_filter_specs(profile, [fallback_format])
+    return sorted(set(image_specs))
+
+
+def get_missing_specs(image, specs):
+    existing = set(image.renditions.values_list('filter_spec', 'focal_point_key'))
+    return [spec for spec in specs if (spec, Filter(spec).get_cache_key(image)) not in existing]
+
+
+def generate_missing(image, specs, profiles):
+    """
+    Create the renditions (and placeholder) of the image that don't exist
+    yet, return how many renditions and placeholders were created.
+    """
+    from .models import ImagePlaceholder
+
+    missing = get_missing_specs(image, get_image_specs(image, specs, profiles))
+    if missing:
+        image.get_renditions(*missing)
+    created = len(missing)
+    if not image.is_svg() and not ImagePlaceholder.is_current(image):
+        ImagePlaceholder.generate(image)
+        created += 1
+    return created
+
+
+def get_referenced_images(obj):
+    """
+    The image itself, or the images used by a page or snippet (according to
+    Wagtail's reference index), including those of the snippets it uses.
+    """
+    image_model = get_image_model()
+    if isinstance(obj, image_model):
+        return [obj]
+    image_type = ContentType.objects.get_for_model(image_model)
+    references = ReferenceIndex.get_references_for_object(obj)
+    image_ids = set(references.filter(to_content_type=image_type).values_list('to_object_id', flat=True))
+    snippet_types = [ContentType.objects.get_for_model(model) for model in get_snippet_models()]
+    for content_type_id, object_id in references.filter(to_content_type__in=snippet_types).values_list(
+        'to_content_type_id', 'to_object_id'
+    ):
+        image_ids.update(
+            ReferenceIndex.objects.filter(
+                base_content_type_id=content_type_id, object_id=object_id, to_content_type=image_type
+            ).values_list('to_object_id', flat=True)
+        )
+    return list(image_model.objects.filter(pk__in=image_ids))
+
+
+def process_job(job, specs, profiles):
+    """
+    Generate the missing renditions and placeholders of the job's images,
+    return how many were created.
+    """
+    try:
+        obj = job.content_type.get_object_for_this_type(pk=job.object_id)
+    except job.content_type.model_class().DoesNotExist:
+        return 0  # Deleted since it was queued
+    return sum(generate_missing(image, specs, profiles) for image in get_referenced_images(obj))
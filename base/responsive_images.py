@@ -0,0 +1,184 @@
+"""
+Responsive images: the renditions and <picture> markup for an image
+"profile" from settings.RESPONSIVE_IMAGE_PROFILES.
+
+Each profile lists the widths to generate and the ``sizes`` attribute to
+send, and optionally a ``ratio`` (width, height) to crop to. Every width is
+generated in each of settings.RESPONSIVE_IMAGE_FORMATS plus a fallback in
+the original's format family (JPEG for photos, PNG for everything else).
+
+With settings.RENDITIONS_IN_BACKGROUND, missing renditions are queued for
+the process_rendition_jobs command and the original is shown meanwhile.
+get_rendition does the same for a single filter spec, for the templates
+that need one rendition rather than a <picture>. recording_fallbacks tells
+callers caching rendered markup whether anything fell back to an original.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+from wagtail.images.models import Filter, Picture
+from wagtail.images.shortcuts import get_rendition_or_not_found, get_renditions_or_not_found
+from wagtail.images.utils import to_svg_safe_spec
+
+from .models import ImagePlaceholder, RenditionJob
+
+DEFAULT_FORMATS = ['avif', 'webp']
+FALLBACK_FORMATS = ['jpeg', 'png']
+
+# Attributes for images below the fold; pass loading="eager" for the ones above it
+DEFAULT_ATTRS = {'loading': 'lazy', 'decoding': 'async'}
+
+# Ids of the images shown without their renditions or placeholder, see recording_fallbacks
+_fallbacks = ContextVar('responsive_image_fallbacks', default=None)
+
+
+def get_profile(name):
+    return settings.RESPONSIVE_IMAGE_PROFILES[name]
+
+
+def get_fallback_format(image):
+    return 'jpeg' if image.file.name.lower().endswith(('.jpg', '.jpeg')) else 'png'
+
+
+def _resize_spec(profile, width):
+    if 'ratio' in profile:
+        ratio_width, ratio_height = profile['ratio']
+        return f'fill-{width}x{round(width * ratio_height / ratio_width)}'
+    return f'width-{width}'
+
+
+def get_filter_specs(profile_name, fallback_formats=None):
+    """
+    Filter specs of every rendition of the profile, for the given fallback
+    formats (all of them by default). Also used to prefetch renditions.
+    """
+    profile = get_profile(profile_name)
+    formats = getattr(settings, 'RESPONSIVE_IMAGE_FORMATS', DEFAULT_FORMATS) + (fallback_formats or FALLBACK_FORMATS)
+    return [
+        f'{_resize_spec(profile, width)}|format-{image_format}'
+        for image_format in formats
+        for width in profile['widths']
+    ]
+
+
+def _without_repeated_widths(renditions):
+    # Images narrower than the largest widths give several renditions of the same size
+    seen = set()
+    unique = {}
+    for spec, rendition in renditions.items():
+        image_format = spec.rpartition('format-')[2]
+        if (image_format, rendition.width) not in seen:
+            seen.add((image_format, rendition.width))
+            unique[spec] = rendition
+    return unique
+
+
+def render(image, profile_name, **attrs):
+    """Return the <picture> element (or <img> for SVGs) showing ``image`` with the profile."""
+    if not image:
+        return ''
+    profile = get_profile(profile_name)
+    attrs = {**DEFAULT_ATTRS, 'sizes': profile['sizes'], **attrs}
+    if image.is_svg():
+        # Scales without renditions
+        attrs.pop('sizes')
+        return get_rendition_or_not_found(image, 'original').img_tag(attrs)
+
+    specs = get_filter_specs(profile_name, [get_fallback_format(image)])
+    if getattr(settings, 'RENDITIONS_IN_BACKGROUND', False):
+        found = image.find_existing_renditions(*[Filter(spec) for spec in specs])
+        if len(found) < len(specs):
+            queue_renditions(image)
+            return render_original(image, attrs)
+        renditions = {spec_filter.spec: rendition for spec_filter, rendition in found.items()}
+        renditions = {spec: renditions[spec] for spec in specs}
+    else:
+        renditions = get_renditions_or_not_found(image, specs)
+    return Picture(_without_repeated_widths(renditions), attrs).__html__()
+
+
+def render_original(image, attrs):
+    """An <img> of the uploaded file, for while the renditions are being generated."""
+    attrs = {key: value for key, value in attrs.items() if key != 'sizes'}
+    attrs.setdefault('alt', image.default_alt_text)
+    return format_html('<img src="{}" width="{}" height="{}"{}>', image.file.url, image.width, image.height, flatatt(attrs))
+
+
+class OriginalRendition:
+    """
+    Stands in for a rendition that is still queued: the uploaded file, with
+    the attributes templates read from renditions.
+    """
+    def __init__(self, image):
+        self.image = image
+        self.pk = image.pk
+        self.file = image.file
+        self.file_hash = image.file_hash
+        self.url = image.file.url
+        self.width = image.width
+        self.height = image.height
+        self.alt = image.default_alt_text
+
+    def img_tag(self, extra_attributes=None):
+        return render_original(self.image, extra_attributes or {})
+
+    def __html__(self):
+        return self.img_tag()
+
+
+def get_rendition(image, spec, preserve_svg=False):
+    """
+    The rendition of ``image`` for a filter spec, like the {% image %} tag.
+    With RENDITIONS_IN_BACKGROUND a missing rendition is queued and an
+    OriginalRendition is returned meanwhile.
+    """
+    if not image:
+        return None
+    if preserve_svg and image.is_svg():
+        spec = to_svg_safe_spec(spec) or 'original'
+    if getattr(settings, 'RENDITIONS_IN_BACKGROUND', False):
+        found = image.find_existing_renditions(Filter(spec))
+        if not found:
+            queue_renditions(image)
+            return OriginalRendition(image)
+        return next(iter(found.values()))
+    return get_rendition_or_not_found(image, spec)
+
+
+@contextmanager
+def recording_fallbacks():
+    """
+    Collect the ids of the images rendered within the block that were shown
+    without their renditions or placeholder, which are still queued.
+    """
+    token = _fallbacks.set([])
+    try:
+        yield _fallbacks.get()
+    finally:
+        _fallbacks.reset(token)
+
+
+def queue_renditions(image):
+    fallbacks = _fallbacks.get()
+    if fallbacks is not None:
+        fallbacks.append(image.pk)
+    # Only one job per image while the first is waiting, not one per page view
+    if cache.add(f'renditions:queued:{image.pk}', True, 5 * 60):
+        # Jobs that keep failing are retried when the image is saved again, not on every view
+        RenditionJob.enqueue(image, retry_failed=False)
+
+
+def get_placeholder(image):
+    """The data URI of the image's placeholder, or an empty string while there is none."""
+    if not image or image.is_svg():
+        return ''
+    if ImagePlaceholder.is_current(image):
+        return image.placeholder.data_uri
+    if getattr(settings, 'RENDITIONS_IN_BACKGROUND', False):
+        queue_renditions(image)
+        return ''
+    return ImagePlaceholder.generate(image).data_uri
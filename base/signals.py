@@ -0,0 +1,83 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from wagtail.images import get_image_model
+from wagtail.models import Page, Site
+from wagtail.signals import page_published, page_unpublished, post_page_move
+from wagtail.snippets.models import get_snippet_models
+
+from blog.models import Comment
+
+from . import navigation, page_cache, svg
+from .models import RenditionJob, SiteSettings
+
+
+# Menus, listings and "latest articles" sections make any page change visible site-wide
+@receiver(page_published)
+@receiver(page_unpublished)
+@receiver(post_page_move)
+@receiver(post_delete, sender=Page)
+@receiver(post_save, sender=SiteSettings)
+def invalidate_all_pages(sender, **kwargs):
+    page_cache.invalidate(page_cache.GLOBAL_TAG)
+
+
+# The cached settings hold the logo images and the donate page
+@receiver(page_published)
+@receiver(page_unpublished)
+@receiver(post_page_move)
+@receiver(post_delete, sender=Page)
+@receiver(post_save, sender=SiteSettings)
+@receiver(post_save, sender=get_image_model())
+@receiver(post_delete, sender=get_image_model())
+def clear_site_settings_cache(sender, **kwargs):
+    SiteSettings.clear_cache()
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+@receiver(post_page_move)
+@receiver(post_delete, sender=Page)
+@receiver(post_save, sender=Site)
+@receiver(post_delete, sender=Site)
+def invalidate_navigation(sender, **kwargs):
+    # Titles, slugs and "show in menus" only change on the live page when it is published
+    navigation.invalidate()
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_pages_for_model(sender, instance, **kwargs):
+    if sender is get_image_model():
+        page_cache.invalidate(page_cache.GLOBAL_TAG)
+    elif sender in get_snippet_models():
+        page_cache.invalidate(page_cache.snippet_tag(instance))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_commented_page(sender, instance, **kwargs):
+    # The article shows the comments, the blog listing shows the counts
+    article = Page.objects.filter(pk=instance.page_id).first()
+    if article is not None:
+        page_cache.invalidate(page_cache.page_tag(article.pk), page_cache.page_tag(article.get_parent().pk))
+
+
+@receiver(post_save, sender=get_image_model())
+@receiver(post_save, sender=get_image_model().get_rendition_model())
+def warm_svg_markup(sender, instance, **kwargs):
+    # Icons are inlined by the inline_svg filter; have them ready before the first render
+    svg.warm(instance.file, version=svg.get_version(instance))
+
+
+# Generate renditions in the background (process_rendition_jobs) rather than while rendering pages
+@receiver(post_save, sender=get_image_model())
+@receiver(page_published)
+def queue_renditions(sender, instance, **kwargs):
+    transaction.on_commit(lambda: RenditionJob.enqueue(instance))
+
+
+@receiver(post_save)
+def queue_snippet_renditions(sender, instance, **kwargs):
+    if sender in get_snippet_models():
+        transaction.on_commit(lambda: RenditionJob.enqueue(instance))
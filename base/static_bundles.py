@@ -0,0 +1,117 @@
+"""
+Static file bundles: the stylesheets and scripts of each page type from
+settings.STATIC_BUNDLES, concatenated and minified into one CSS and one JS
+file (bundles/<name>.css, bundles/<name>.js).
+
+The bundles are built by ``collectstatic`` (see BundledManifestStaticFilesStorage),
+so ManifestStaticFilesStorage fingerprints them like any other file. The
+{% static_bundle %} tag links the bundle, or its source files with DEBUG on.
+"""
+import logging
+import posixpath
+import re
+
+import rcssmin
+import rjsmin
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_DIR = 'bundles'
+KINDS = ('css', 'js')
+
+CSS_URL_RE = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+CSS_AT_RULE_RE = re.compile(r'''@(?:charset|import)\s*(?:url\([^)]*\)|"[^"]*"|'[^']*')[^;]*;''')
+SOURCE_MAP_RE = re.compile(r'^\s*//[#@] sourceMappingURL=.*$', re.MULTILINE)
+
+
+def get_sources(name, kind):
+    return settings.STATIC_BUNDLES[name].get(kind, [])
+
+
+def get_bundle_path(name, kind):
+    return f'{BUNDLE_DIR}/{name}.{kind}'
+
+
+def is_enabled():
+    return getattr(settings, 'STATIC_BUNDLES_ENABLED', not settings.DEBUG)
+
+
+def rewrite_css_urls(css, source_path, bundle_path):
+    """Make the relative url()s of a stylesheet relative to the bundle it's moved into."""
+    source_dir = posixpath.dirname(source_path)
+    bundle_dir = posixpath.dirname(bundle_path)
+
+    def rewrite(match):
+        quote, url = match.groups()
+        if url.startswith(('/', '#', 'data:', 'http:', 'https:')):
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(source_dir, url))
+        return f'url({quote}{posixpath.relpath(target, bundle_dir)}{quote})'
+
+    return CSS_URL_RE.sub(rewrite, css)
+
+
+def build(name, kind, open_source):
+    """Return the content of a bundle, reading its sources with ``open_source(path)``."""
+    bundle_path = get_bundle_path(name, kind)
+    imports = []
+    parts = []
+    for path in get_sources(name, kind):
+        with open_source(path) as source:
+            content = source.read().decode('utf-8')
+        if kind == 'css':
+            css = rcssmin.cssmin(rewrite_css_urls(content, path, bundle_path))
+            # @import only works at the start of a stylesheet, @charset only as its first rule
+            imports += [rule for rule in CSS_AT_RULE_RE.findall(css) if rule.startswith('@import')]
+            parts.append(CSS_AT_RULE_RE.sub('', css))
+        else:
+            # The source maps don't apply to the bundle, and a file without a
+            # trailing semicolon mustn't run into the next one
+            parts.append(rjsmin.jsmin(SOURCE_MAP_RE.sub('', content)) + ';')
+    return '\n'.join(imports + parts)
+
+
+class BundledManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also builds the STATIC_BUNDLES from the
+    collected files, before they're all hashed.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            from .critical_css import get_stale
+
+            paths = dict(paths)
+            css_bundles = {}
+            for name in settings.STATIC_BUNDLES:
+                for kind in KINDS:
+                    if not get_sources(name, kind):
+                        continue
+                    bundle_path = get_bundle_path(name, kind)
+                    content = build(name, kind, self.open)
+                    if self.exists(bundle_path):
+                        self.delete(bundle_path)
+                    self._save(bundle_path, ContentFile(content.encode('utf-8')))
+                    paths[bundle_path] = (self, bundle_path)
+                    if kind == 'css':
+                        css_bundles[name] = content
+            if stale := get_stale(css_bundles):
+                logger.warning('Outdated critical CSS of %s, run manage.py generate_critical_css', ', '.join(stale))
+        yield from super().post_process(paths, dry_run, **options)
+
+    def url_converter(self, name, hashed_files, template=None):
+        converter = super().url_converter(name, hashed_files, template)
+
+        def converter_or_unchanged(matchobj):
+            # The theme's stylesheets refer to images that were never part of the site,
+            # don't fail the whole collectstatic for them
+            try:
+                return converter(matchobj)
+            except ValueError as e:
+                logger.warning('%s: %s', name, e)
+                return matchobj.group(0)
+
+        return converter_or_unchanged
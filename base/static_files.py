@@ -0,0 +1,166 @@
+"""
+Static files served by the app itself, so the container needs no separate
+web server for them.
+
+collectstatic writes a gzip (.gz) and a brotli (.br) copy next to every
+compressible file (see CompressedManifestStaticFilesStorage), and
+StaticFilesMiddleware serves STATIC_ROOT, picking the smallest copy the
+browser accepts. Names hashed by ManifestStaticFilesStorage never change
+content, so they are cached for a year; other names for
+STATIC_FILES_MAX_AGE seconds.
+
+Responses are FileResponses of the files on disk, which the WSGI server
+sends with sendfile() where it can (gunicorn does by default).
+"""
+import gzip
+import mimetypes
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import brotli
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotAllowed
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .static_bundles import BundledManifestStaticFilesStorage
+
+# Extensions of the files worth compressing, images and woff fonts already are
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.json', '.map', '.svg', '.txt', '.xml', '.html', '.ico', '.ttf', '.otf', '.eot'}
+
+# Preferred first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+# Compressed copies that don't save at least this much are not kept
+MIN_RATIO = 0.95
+
+# ManifestStaticFilesStorage adds the first 12 hex digits of the MD5 of the content
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+ONE_YEAR = 365 * 24 * 60 * 60
+
+
+def is_compressible(name):
+    return os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+def compress_file(path):
+    """Write the .gz and .br copies of a file, unless they're up to date or not worth it."""
+    mtime = os.path.getmtime(path)
+    content = None
+    for encoding, suffix in ENCODINGS:
+        compressed_path = path + suffix
+        if os.path.exists(compressed_path) and os.path.getmtime(compressed_path) >= mtime:
+            continue
+        if content is None:
+            with open(path, 'rb') as source:
+                content = source.read()
+        if encoding == 'br':
+            compressed = brotli.compress(content, quality=11)
+        else:
+            compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        if len(compressed) < len(content) * MIN_RATIO:
+            with open(compressed_path, 'wb') as output:
+                output.write(compressed)
+        elif os.path.exists(compressed_path):
+            os.remove(compressed_path)
+
+
+class CompressedManifestStaticFilesStorage(BundledManifestStaticFilesStorage):
+    """Also writes the compressed copies of the collected (and hashed) files."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if isinstance(hashed_name, str):
+                names.update([name, hashed_name])
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        paths = [self.path(name) for name in sorted(names) if is_compressible(name)]
+        # Brotli at its best quality is slow, compress several files at once
+        with ThreadPoolExecutor() as pool:
+            list(pool.map(compress_file, paths))
+
+
+def get_accepted_encodings(request):
+    accepted = set()
+    for item in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = params.strip().removeprefix('q=')
+        try:
+            if params and float(quality) <= 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def serve(request, name):
+    """Response for the file ``name`` of STATIC_ROOT."""
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    try:
+        path = safe_join(settings.STATIC_ROOT, name)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(path):
+        raise Http404
+    # The compressed copies are only served in place of their original, with a Content-Encoding
+    if any(path.endswith(suffix) and os.path.isfile(path.removesuffix(suffix)) for _, suffix in ENCODINGS):
+        raise Http404
+
+    accepted = get_accepted_encodings(request)
+    served_path, content_encoding, has_variants = path, None, False
+    for encoding, suffix in ENCODINGS:
+        if os.path.exists(path + suffix):
+            has_variants = True
+            if content_encoding is None and encoding in accepted:
+                served_path, content_encoding = path + suffix, encoding
+
+    stat = os.stat(served_path)
+    etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    response = FileResponse(open(served_path, 'rb'), content_type=content_type)
+    # Shown inline by default, the file name of the compressed copy doesn't matter
+    del response['Content-Disposition']
+    if content_encoding:
+        response['Content-Encoding'] = content_encoding
+    if has_variants:
+        patch_vary_headers(response, ['Accept-Encoding'])
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if HASHED_NAME_RE.search(name):
+        patch_cache_control(response, public=True, max_age=ONE_YEAR, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=getattr(settings, 'STATIC_FILES_MAX_AGE', 60))
+
+    conditional_response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime), response=response
+    )
+    if conditional_response is not response:
+        response.close()
+        return conditional_response
+    if request.method == 'HEAD':
+        # Headers only, the file is still closed with the response
+        response.streaming_content = []
+    return response
+
+
+class StaticFilesMiddleware:
+    """
+    Serve the files under STATIC_URL from STATIC_ROOT, before any other
+    middleware runs. On when DEBUG is off, unless STATIC_FILES_SERVE is False.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if getattr(settings, 'STATIC_FILES_SERVE', not settings.DEBUG) and request.path.startswith(settings.STATIC_URL):
+            return serve(request, request.path[len(settings.STATIC_URL):])
+        return self.get_response(request)
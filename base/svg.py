@@ -0,0 +1,213 @@
+"""
+Sanitized, minified SVG markup for inlining icons into pages.
+
+Markup is cached per file (storage name plus a version that changes whenever
+the file content can, see get_version) in this process and in the
+shared cache, so inlining an icon only reads the file the first time any
+worker needs it. Files are warmed as soon as they are written, see
+base/signals.py.
+"""
+import hashlib
+import logging
+import re
+import xml.etree.ElementTree as ET
+
+from defusedxml import ElementTree as SafeET
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+SVG_NS = 'http://www.w3.org/2000/svg'
+XLINK_NS = 'http://www.w3.org/1999/xlink'
+XML_NS = 'http://www.w3.org/XML/1998/namespace'
+
+ET.register_namespace('', SVG_NS)
+ET.register_namespace('xlink', XLINK_NS)
+
+# Only these elements are kept, with their content; anything else (script,
+# style, foreignObject, animate, set, feImage, editor metadata...) is removed
+ALLOWED_TAGS = {
+    'svg', 'g', 'defs', 'symbol', 'use', 'title', 'desc', 'image', 'switch',
+    'path', 'rect', 'circle', 'ellipse', 'line', 'polyline', 'polygon',
+    'text', 'tspan', 'textPath',
+    'linearGradient', 'radialGradient', 'stop', 'pattern', 'clipPath', 'mask', 'marker',
+    'filter', 'feBlend', 'feColorMatrix', 'feComponentTransfer', 'feComposite',
+    'feConvolveMatrix', 'feDiffuseLighting', 'feDisplacementMap', 'feDistantLight',
+    'feDropShadow', 'feFlood', 'feFuncA', 'feFuncB', 'feFuncG', 'feFuncR',
+    'feGaussianBlur', 'feMerge', 'feMergeNode', 'feMorphology', 'feOffset',
+    'fePointLight', 'feSpecularLighting', 'feSpotLight', 'feTile', 'feTurbulence',
+}
+# Geometry, presentation and filter attributes; event handlers and anything
+# else are removed
+ALLOWED_ATTRIBUTES = {
+    'id', 'class', 'style', 'lang', 'transform', 'viewBox', 'preserveAspectRatio',
+    'version', 'width', 'height', 'x', 'y', 'x1', 'y1', 'x2', 'y2', 'cx', 'cy', 'r', 'rx', 'ry',
+    'fx', 'fy', 'fr', 'd', 'points', 'pathLength', 'dx', 'dy', 'rotate', 'textLength',
+    'lengthAdjust', 'startOffset', 'method', 'spacing', 'side',
+    'fill', 'fill-opacity', 'fill-rule', 'stroke', 'stroke-dasharray', 'stroke-dashoffset',
+    'stroke-linecap', 'stroke-linejoin', 'stroke-miterlimit', 'stroke-opacity', 'stroke-width',
+    'opacity', 'color', 'display', 'visibility', 'overflow', 'clip', 'clip-path', 'clip-rule',
+    'mask', 'filter', 'marker-start', 'marker-mid', 'marker-end', 'paint-order',
+    'vector-effect', 'shape-rendering', 'text-rendering', 'image-rendering',
+    'color-interpolation', 'color-interpolation-filters', 'stop-color', 'stop-opacity',
+    'flood-color', 'flood-opacity', 'lighting-color',
+    'font-family', 'font-size', 'font-style', 'font-variant', 'font-weight', 'font-stretch',
+    'text-anchor', 'text-decoration', 'dominant-baseline', 'alignment-baseline',
+    'baseline-shift', 'letter-spacing', 'word-spacing', 'writing-mode', 'direction',
+    'unicode-bidi', 'xml:space',
+    'gradientUnits', 'gradientTransform', 'spreadMethod', 'offset',
+    'patternUnits', 'patternContentUnits', 'patternTransform',
+    'clipPathUnits', 'maskUnits', 'maskContentUnits',
+    'markerUnits', 'markerWidth', 'markerHeight', 'refX', 'refY', 'orient',
+    'filterUnits', 'primitiveUnits', 'in', 'in2', 'result', 'mode', 'operator', 'values',
+    'type', 'k1', 'k2', 'k3', 'k4', 'stdDeviation', 'edgeMode', 'order', 'kernelMatrix',
+    'divisor', 'bias', 'targetX', 'targetY', 'preserveAlpha', 'scale', 'xChannelSelector',
+    'yChannelSelector', 'surfaceScale', 'diffuseConstant', 'specularConstant',
+    'specularExponent', 'kernelUnitLength', 'azimuth', 'elevation', 'z', 'pointsAtX',
+    'pointsAtY', 'pointsAtZ', 'limitingConeAngle', 'radius', 'baseFrequency', 'numOctaves',
+    'seed', 'stitchTiles', 'tableValues', 'slope', 'intercept', 'amplitude', 'exponent',
+    'href', 'xlink:href',
+}
+# Links may only point inside the document; <image> may also embed a picture
+HREF_ATTRIBUTES = {'href', 'xlink:href'}
+IMAGE_URL_PREFIXES = ('data:image/png', 'data:image/jpeg', 'data:image/gif', 'data:image/webp')
+# url(...) in presentation attributes and style may only reference the document
+CSS_URL_RE = re.compile(r'url\s*\(\s*[\'"]?([^\'")]*)', re.IGNORECASE)
+UNSAFE_CSS_RE = re.compile(
+    r'@import|expression\s*\(|image-set\s*\(|src\s*\(|javascript:|-moz-binding|behavior\s*:', re.IGNORECASE
+)
+
+CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# Markup kept in this process, the most recently loaded icons
+LOCAL_CACHE_SIZE = 200
+_markup = {}
+
+
+def _split_name(name):
+    namespace, _, local_name = name.rpartition('}')
+    return namespace.lstrip('{'), local_name
+
+
+def _element_name(tag):
+    namespace, name = _split_name(tag)
+    return name if namespace in ('', SVG_NS) else None
+
+
+def _attribute_name(attribute):
+    namespace, name = _split_name(attribute)
+    prefixes = {'': '', XLINK_NS: 'xlink:', XML_NS: 'xml:'}
+    return prefixes[namespace] + name if namespace in prefixes else None
+
+
+def _normalize_url(value):
+    # Browsers ignore whitespace and control characters inside URL schemes
+    return re.sub(r'[\x00-\x20]', '', value).lower()
+
+
+def _is_safe_href(element_name, value):
+    url = _normalize_url(value)
+    if element_name == 'image' and url.startswith(IMAGE_URL_PREFIXES):
+        return True
+    return url.startswith('#')
+
+
+def _is_safe_css(value):
+    # Escapes and comments could hide a url() or @import from the checks
+    if '\\' in value or '/*' in value or UNSAFE_CSS_RE.search(value):
+        return False
+    return all(_normalize_url(url).startswith('#') for url in CSS_URL_RE.findall(value))
+
+
+def _is_allowed_attribute(element_name, name, value):
+    if name not in ALLOWED_ATTRIBUTES:
+        return False
+    if name in HREF_ATTRIBUTES:
+        return _is_safe_href(element_name, value)
+    return _is_safe_css(value)
+
+
+def _is_svg(file):
+    return bool(file) and file.name.lower().endswith('.svg')
+
+
+def get_version(image_or_rendition):
+    # Renditions are recreated under a new id; images keep their id but get a new file hash
+    return '%s.%s' % (image_or_rendition.pk, getattr(image_or_rendition, 'file_hash', ''))
+
+
+def get_cache_key(file, version=None):
+    return 'svg:%s:%s' % (hashlib.md5(file.name.encode()).hexdigest(), version or '')
+
+
+def sanitize(content):
+    """
+    Return the SVG reduced to an allowlist of elements and attributes, with
+    links and url() references limited to the document itself, and without
+    whitespace between tags.
+    """
+    root = SafeET.fromstring(content)
+    if _element_name(root.tag) != 'svg':
+        raise ValueError('Not an SVG document')
+
+    for parent in root.iter():
+        for child in list(parent):
+            if not isinstance(child.tag, str) or _element_name(child.tag) not in ALLOWED_TAGS:
+                parent.remove(child)
+        element_name = _element_name(parent.tag)
+        for attribute, value in list(parent.attrib.items()):
+            if not _is_allowed_attribute(element_name, _attribute_name(attribute), value):
+                del parent.attrib[attribute]
+        # Indentation between tags is not rendered
+        if parent.text and not parent.text.strip():
+            parent.text = None
+        if parent.tail and not parent.tail.strip():
+            parent.tail = None
+
+    return ET.tostring(root, encoding='unicode').replace(' />', '/>')
+
+
+def _load(file):
+    with default_storage.open(file.name, 'rb') as svg_file:
+        return sanitize(svg_file.read())
+
+
+def get_markup(file, version=None):
+    """
+    Return the sanitized markup of an SVG file, or an empty string if the file
+    is missing or not a valid SVG. ``version`` must change whenever the file
+    content can change.
+    """
+    if not _is_svg(file):
+        return ''
+    key = get_cache_key(file, version)
+    markup = _markup.get(key)
+    if markup is not None:
+        return markup
+
+    markup = cache.get(key)
+    if markup is None:
+        try:
+            markup = _load(file)
+        except Exception:
+            logger.warning('Could not inline SVG %s', file.name, exc_info=True)
+            markup = ''
+        cache.set(key, markup, CACHE_TIMEOUT)
+    if len(_markup) >= LOCAL_CACHE_SIZE:
+        # Forget the oldest, dicts keep insertion order
+        del _markup[next(iter(_markup))]
+    _markup[key] = markup
+    return markup
+
+
+def warm(file, version=None):
+    """Sanitize a newly written SVG and put it in the shared cache."""
+    if not _is_svg(file):
+        return
+    try:
+        markup = _load(file)
+    except Exception:
+        logger.warning('Could not inline SVG %s', file.name, exc_info=True)
+        return
+    cache.set(get_cache_key(file, version), markup, CACHE_TIMEOUT)
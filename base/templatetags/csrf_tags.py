@@ -0,0 +1,15 @@
+from django import template
+from django.urls import reverse
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+@register.simple_tag
+def lazy_csrf_token():
+    # Empty CSRF field, filled in by passion4health.js when the visitor starts
+    # using the form, so the page itself stays the same for every visitor
+    return format_html(
+        '<input type="hidden" name="csrfmiddlewaretoken" value="" data-csrf-url="{}">',
+        reverse('csrf_token'),
+    )
@@ -0,0 +1,17 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from base import fragment_cache
+
+register = template.Library()
+
+
+@register.simple_tag
+def cached_stream(snippet, field_name):
+    """
+    Render a snippet's StreamField from the fragment cache, e.g.
+    {% cached_stream page.our_services "services" %}
+    """
+    if not snippet:
+        return ''
+    return mark_safe(fragment_cache.render_stream(snippet, field_name))
@@ -3,10 +3,25 @@ from django import template
 # import site:
 from wagtail.models import Site
 
+from base import navigation
+
 register = template.Library()
 
 
 # ... keep the definition of get_footer_text and add the get_site_root template tag:
 @register.simple_tag(takes_context=True)
 def get_site_root(context):
-    return Site.find_for_request(context["request"]).root_page
\ No newline at end of file
+    return Site.find_for_request(context["request"]).root_page
+
+
+@register.simple_tag(takes_context=True)
+def get_menu(context):
+    """
+    The site menu: the root page (title, url, active) with its in-menu pages
+    as ``children``, rendered from the cached navigation tree.
+    """
+    request = context["request"]
+    site = Site.find_for_request(request)
+    if site is None:
+        return None
+    return navigation.get_menu(site, request.path)
@@ -0,0 +1,36 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from base import responsive_images
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, profile_name, **attrs):
+    """
+    Render an image as a <picture> with srcset/sizes from one of the
+    RESPONSIVE_IMAGE_PROFILES, e.g.
+    {% responsive_image page.main_image "article" class="img-fluid" loading="eager" %}
+    """
+    return mark_safe(responsive_images.render(image, profile_name, **attrs))
+
+
+@register.simple_tag
+def image_rendition(image, spec, preserve_svg=False):
+    """
+    The rendition of an image for a filter spec, like {% image %}, but left
+    to the rendition queue when it is missing (the original is used
+    meanwhile), e.g.
+    {% image_rendition self.background_image "max-1600x900" as background_image %}
+    """
+    return responsive_images.get_rendition(image, spec, preserve_svg=preserve_svg)
+
+
+@register.filter
+def placeholder(image):
+    """
+    Data URI of a tiny blurred version of the image, to show until the image
+    has loaded, e.g. style="background-image: url({{ image|placeholder }})"
+    """
+    return responsive_images.get_placeholder(image)
@@ -0,0 +1,42 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from base import critical_css, static_bundles
+
+register = template.Library()
+
+TAGS = {
+    'css': '<link rel="stylesheet" href="{}">',
+    'js': '<script src="{}"></script>',
+}
+# Loaded without blocking rendering, once the critical CSS is inlined
+DEFERRED_CSS_TAG = (
+    '<link rel="preload" href="{0}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">'
+    '<noscript><link rel="stylesheet" href="{0}"></noscript>'
+)
+
+
+@register.simple_tag
+def static_bundle(name, kind, defer=False):
+    """
+    Link one of the STATIC_BUNDLES, or each of its files while developing, e.g.
+    {% static_bundle "home" "css" %}. Stylesheets are loaded asynchronously with
+    defer=True (when the page has its critical CSS inlined).
+    """
+    tag = DEFERRED_CSS_TAG if defer and kind == 'css' else TAGS[kind]
+    if static_bundles.is_enabled():
+        return format_html(tag, static(static_bundles.get_bundle_path(name, kind)))
+    return format_html_join('\n', tag, ((static(path),) for path in static_bundles.get_sources(name, kind)))
+
+
+@register.simple_tag(name='critical_css')
+def inline_critical_css(page):
+    """
+    The above-the-fold CSS of the page's type (see base/critical_css.py), e.g.
+    {% critical_css page as critical %}<style>{{ critical }}</style>
+    """
+    if not page:
+        return ''
+    return mark_safe(critical_css.get_css(page))
@@ -1,3 +1,346 @@
-from django.test import TestCase
+import datetime
+import gzip
+import os
+import shutil
+import tempfile
 
-# Create your tests here.
+import brotli
+from django.conf import settings
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from wagtail.models import Site
+
+from blog.models import BlogAndNewsArticle, BlogIndex, Comment
+from snippets.models import OurService
+
+from . import page_cache, static_files, svg
+from .models import SiteSettings
+
+# Page caches are kept out of the project's file cache
+LOCMEM_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'base-tests-{alias}'}
+    for alias in settings.CACHES
+}
+# Pages link static files that only have manifest entries after collectstatic
+NO_MANIFEST_STORAGES = {
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+def sanitize(markup):
+    return svg.sanitize(
+        '<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">'
+        f'{markup}</svg>'
+    )
+
+
+class SvgSanitizeTests(SimpleTestCase):
+    def assertRemoved(self, markup, removed):
+        sanitized = sanitize(markup)
+        self.assertNotIn(removed, sanitized.lower(), sanitized)
+
+    def test_drawing_is_kept(self):
+        markup = (
+            '<defs><linearGradient id="g"><stop offset="0" stop-color="#fff"/></linearGradient></defs>'
+            '<g transform="scale(2)"><path d="M0 0L1 1" fill="url(#g)" style="stroke:red"/></g>'
+            '<use xlink:href="#g"/>'
+        )
+
+        self.assertEqual(sanitize(markup), (
+            '<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">'
+            f'{markup}</svg>'
+        ))
+
+    def test_scripts_and_active_elements_are_removed(self):
+        for markup in (
+            '<script>alert(1)</script>',
+            '<foreignObject><div xmlns="http://www.w3.org/1999/xhtml">x</div></foreignObject>',
+            '<animate attributeName="href" values="javascript:alert(1)"/>',
+            '<set attributeName="href" to="javascript:alert(1)"/>',
+            '<style>@import url(//example.com/x.css)</style>',
+            '<feImage href="//example.com/x.svg"/>',
+        ):
+            with self.subTest(markup=markup):
+                self.assertEqual(sanitize(markup), sanitize(''))
+
+    def test_event_handlers_are_removed(self):
+        self.assertRemoved('<rect onload="alert(1)" onclick="alert(1)"/>', 'alert')
+
+    def test_links_outside_the_document_are_removed(self):
+        for markup in (
+            '<a href="javascript:alert(1)"><text>x</text></a>',
+            '<use href="javascript:alert(1)"/>',
+            '<use href=" java&#9;script:alert(1)"/>',
+            '<use xlink:href="//example.com/sprite.svg#icon"/>',
+            '<use href="data:image/svg+xml;base64,AA"/>',
+            '<image xlink:href="data:image/svg+xml;base64,AA"/>',
+            '<image href="https://example.com/tracker.png"/>',
+        ):
+            with self.subTest(markup=markup):
+                self.assertNotIn('href', sanitize(markup))
+
+    def test_embedded_bitmap_is_kept(self):
+        self.assertIn('href="data:image/png;base64,AA"', sanitize('<image href="data:image/png;base64,AA"/>'))
+
+    def test_css_urls_outside_the_document_are_removed(self):
+        for markup in (
+            '<path fill="url(https://example.com/x)"/>',
+            '<path style="fill:url( \'javascript:alert(1)\' )"/>',
+            '<path style="fill:u\\72l(//example.com/x)"/>',
+            '<path style="fill:u/**/rl(//example.com/x)"/>',
+            '<path style="background:image-set(\'//example.com/x\' 1x)"/>',
+        ):
+            with self.subTest(markup=markup):
+                self.assertRemoved(markup, 'example.com' if 'example' in markup else 'javascript')
+
+    def test_foreign_namespaces_are_removed(self):
+        markup = (
+            '<inkscape:label xmlns:inkscape="http://www.inkscape.org/namespaces/inkscape"/>'
+            '<rect xmlns:inkscape="http://www.inkscape.org/namespaces/inkscape" inkscape:label="a"/>'
+        )
+
+        self.assertNotIn('inkscape', sanitize(markup))
+
+    def test_text_stays_escaped(self):
+        self.assertIn('&lt;script&gt;', sanitize('<title>&lt;/svg&gt;&lt;script&gt;</title>'))
+
+    def test_other_documents_are_rejected(self):
+        with self.assertRaises(ValueError):
+            svg.sanitize('<html><script>alert(1)</script></html>')
+
+    def test_external_entities_are_rejected(self):
+        with self.assertRaises(Exception):
+            svg.sanitize(
+                '<!DOCTYPE svg [<!ENTITY x SYSTEM "file:///etc/passwd">]>'
+                '<svg xmlns="http://www.w3.org/2000/svg"><text>&x;</text></svg>'
+            )
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=NO_MANIFEST_STORAGES)
+class PageCacheTestCase(TestCase):
+    def setUp(self):
+        self.home = Site.objects.get(is_default_site=True).root_page
+        self.index = self.home.add_child(instance=BlogIndex(title="Stories", slug="stories"))
+        self.article = BlogAndNewsArticle(
+            title="Malaria nets", date=datetime.date(2024, 1, 1), intro="An article", body="<p>Some news</p>"
+        )
+        self.index.add_child(instance=self.article)
+        # Created by the first render otherwise, which invalidates every page
+        SiteSettings.objects.create(site_name="Passion4Health", org_name="Passion4Health")
+
+    def cache_status(self, page, **params):
+        return self.client.get(page.url, params).get('X-Page-Cache')
+
+
+class PageCacheTests(PageCacheTestCase):
+    def test_second_visit_is_served_from_the_cache(self):
+        first = self.client.get(self.index.url)
+        second = self.client.get(self.index.url)
+
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(second.content, first.content)
+        self.assertIn('public', second['Cache-Control'])
+
+    def test_pages_of_a_listing_are_cached_separately(self):
+        self.cache_status(self.index)
+
+        self.assertEqual(self.cache_status(self.index, tag='health'), 'miss')
+        self.assertEqual(self.cache_status(self.index, tag='health'), 'hit')
+        # Parameters that don't change the page share the entry
+        self.assertEqual(self.cache_status(self.index, utm_source='newsletter'), 'hit')
+
+    def test_searches_are_not_cached(self):
+        self.client.get(self.index.url, {'search': 'malaria'})
+
+        self.assertIsNone(self.cache_status(self.index, search='malaria'))
+        self.assertEqual(self.cache_status(self.index, search=''), 'miss')
+
+    def test_visitors_with_a_session_are_not_cached(self):
+        self.client.get(self.index.url)
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = 'editor'
+
+        self.assertIsNone(self.cache_status(self.index))
+
+    def test_publishing_invalidates_every_page(self):
+        self.cache_status(self.index)
+        self.cache_status(self.article)
+
+        self.article.save_revision().publish()
+
+        self.assertEqual(self.cache_status(self.index), 'miss')
+        self.assertEqual(self.cache_status(self.article), 'miss')
+
+    def test_comment_invalidates_its_article_and_the_listing_only(self):
+        other = self.index.add_child(instance=BlogAndNewsArticle(
+            title="Water", date=datetime.date(2024, 1, 2), intro="An article", body="<p>Some news</p>"
+        ))
+        for page in (self.index, self.article, other):
+            self.cache_status(page)
+
+        Comment.objects.create(page=self.article, name="Visitor", email="visitor@example.com", comment_text="Thanks!")
+
+        self.assertEqual(self.cache_status(self.article), 'miss')
+        self.assertEqual(self.cache_status(self.index), 'miss')
+        self.assertEqual(self.cache_status(other), 'hit')
+
+    def test_editing_a_snippet_invalidates_the_pages_showing_it(self):
+        services = OurService.objects.create(services=[])
+        home = self.home.specific
+        home.our_services = services
+        home.save_revision().publish()
+        self.cache_status(self.home)
+        self.cache_status(self.index)
+
+        services.save()
+
+        self.assertEqual(self.cache_status(self.home), 'miss')
+        self.assertEqual(self.cache_status(self.index), 'hit')
+
+    def test_posted_comment_shows_on_the_next_visit(self):
+        self.client.get(self.article.url)
+
+        self.client.post(self.article.url, {'name': "Visitor", 'email': "visitor@example.com", 'comment_text': "Thanks!"})
+        response = self.client.get(self.article.url)
+
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, "Thanks!")
+
+    def test_culling_responses_keeps_the_versions(self):
+        self.cache_status(self.index)
+        versions = page_cache.get_tag_versions([page_cache.GLOBAL_TAG])
+
+        page_cache.get_cache().clear()
+
+        self.assertEqual(page_cache.get_tag_versions([page_cache.GLOBAL_TAG]), versions)
+        self.assertEqual(self.cache_status(self.index), 'miss')
+
+
+class ConditionalGetTests(PageCacheTestCase):
+    def assertNotModified(self, response, validators):
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], validators['ETag'])
+        self.assertEqual(response['Last-Modified'], validators['Last-Modified'])
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_cached_page_answers_with_304(self):
+        first = self.client.get(self.index.url)
+
+        response = self.client.get(self.index.url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertNotModified(response, first)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+
+    def test_page_missing_from_the_cache_answers_with_304(self):
+        # Answered by the before_serve_page hook, without rendering the page
+        first = self.client.get(self.index.url)
+        page_cache.get_cache().clear()
+
+        response = self.client.get(self.index.url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertNotModified(response, first)
+
+    def test_if_modified_since(self):
+        first = self.client.get(self.index.url)
+
+        response = self.client.get(self.index.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+
+        self.assertNotModified(response, first)
+
+    def test_changed_page_answers_with_the_new_content(self):
+        first = self.client.get(self.index.url)
+
+        self.article.save_revision().publish()
+        response = self.client.get(self.index.url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    def test_validators_differ_between_pages(self):
+        index = self.client.get(self.index.url)
+        article = self.client.get(self.article.url)
+
+        response = self.client.get(self.article.url, HTTP_IF_NONE_MATCH=index['ETag'])
+
+        self.assertNotEqual(index['ETag'], article['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+
+class StaticFilesTests(SimpleTestCase):
+    css = b'body { color: #333; }\n' * 200
+
+    def setUp(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        settings_override = override_settings(STATIC_ROOT=static_root, STATIC_FILES_SERVE=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        for name in ('app.css', 'app.0123456789ab.css'):
+            path = os.path.join(static_root, name)
+            with open(path, 'wb') as css_file:
+                css_file.write(self.css)
+            static_files.compress_file(path)
+        with open(os.path.join(static_root, 'logo.png'), 'wb') as png_file:
+            png_file.write(b'\x89PNG')
+
+    def get(self, name, accept_encoding='', **headers):
+        request = RequestFactory().get(settings.STATIC_URL + name, HTTP_ACCEPT_ENCODING=accept_encoding, **headers)
+        return static_files.StaticFilesMiddleware(lambda request: None)(request)
+
+    def test_smallest_accepted_encoding_is_served(self):
+        response = self.get('app.css', 'gzip, deflate, br')
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(brotli.decompress(b''.join(response.streaming_content)), self.css)
+
+    def test_gzip_is_served_without_brotli(self):
+        for accept_encoding in ('gzip', 'gzip, br;q=0'):
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.get('app.css', accept_encoding)
+
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+                self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.css)
+
+    def test_original_is_served_without_a_known_encoding(self):
+        for accept_encoding in ('', 'deflate', 'identity'):
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.get('app.css', accept_encoding)
+
+                self.assertNotIn('Content-Encoding', response)
+                self.assertEqual(b''.join(response.streaming_content), self.css)
+
+    def test_vary_only_when_there_are_compressed_copies(self):
+        self.assertEqual(self.get('app.css')['Vary'], 'Accept-Encoding')
+        self.assertNotIn('Vary', self.get('logo.png', 'gzip, br'))
+
+    def test_cache_lifetime(self):
+        hashed = self.get('app.0123456789ab.css')['Cache-Control']
+        unhashed = self.get('app.css')['Cache-Control']
+
+        self.assertIn(f'max-age={static_files.ONE_YEAR}', hashed)
+        self.assertIn('immutable', hashed)
+        self.assertIn(f'max-age={settings.STATIC_FILES_MAX_AGE}', unhashed)
+        self.assertNotIn('immutable', unhashed)
+
+    def test_each_encoding_has_its_own_etag(self):
+        brotli_response = self.get('app.css', 'br')
+
+        response = self.get('app.css', 'br', HTTP_IF_NONE_MATCH=brotli_response['ETag'])
+        gzip_response = self.get('app.css', 'gzip', HTTP_IF_NONE_MATCH=brotli_response['ETag'])
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(gzip_response.status_code, 200)
+
+    def test_compressed_copies_are_not_served_directly(self):
+        for name in ('app.css.gz', 'app.css.br'):
+            with self.subTest(name=name), self.assertRaises(Http404):
+                self.get(name, 'gzip, br')
+
+    def test_missing_and_outside_files(self):
+        for name in ('missing.css', '../settings.py'):
+            with self.subTest(name=name), self.assertRaises(Http404):
+                self.get(name)
@@ -1,4 +1,7 @@
 # views.py
+from django.http import JsonResponse
+from django.middleware.csrf import get_token
+from django.views.decorators.cache import never_cache
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
@@ -12,3 +15,9 @@ def contact_form_submission(request):
         # Optionally send a confirmation email here
         return Response({'message': 'Thank you for contacting us!'}, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@never_cache
+def csrf_token(request):
+    # Lets cached public pages fetch a CSRF token only when a form is used
+    return JsonResponse({'token': get_token(request)})
@@ -0,0 +1,15 @@
+from wagtail import hooks
+
+from . import page_cache
+
+
+@hooks.register('before_serve_page')
+def record_page_cache_dependencies(page, request, serve_args, serve_kwargs):
+    key = getattr(request, 'page_cache_key', None)  # Set by PageCacheMiddleware
+    if key is None or page.get_view_restrictions().exists():
+        return None
+    dependencies = page_cache.get_tag_versions(page_cache.get_dependencies(page))
+    # Picked up by PageCacheMiddleware once the page has been rendered
+    request.page_cache_dependencies = dependencies
+    # Answer conditional requests before doing any rendering
+    return page_cache.not_modified_response(request, key, dependencies)
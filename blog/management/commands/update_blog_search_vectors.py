@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import BlogAndNewsArticle
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search vectors of all blog and news articles."
+
+    def handle(self, *args, **options):
+        count = 0
+        for article in BlogAndNewsArticle.objects.live().iterator():
+            article.update_search_vector()
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Updated search vectors for {count} articles."))
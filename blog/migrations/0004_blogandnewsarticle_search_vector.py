@@ -0,0 +1,43 @@
+# Generated by Django 5.1.1 on 2026-10-16 20:38
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def backfill_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        """
+        UPDATE blog_blogandnewsarticle AS article
+        SET search_vector =
+            setweight(to_tsvector('english', coalesce(page.title, '')), 'A')
+            || setweight(to_tsvector('english', coalesce(article.intro, '')), 'B')
+            || setweight(to_tsvector('english', regexp_replace(coalesce(article.body, ''), '<[^>]+>', ' ', 'g')), 'C')
+        FROM wagtailcore_page AS page
+        WHERE page.id = article.page_ptr_id
+        """
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_comment'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+        ('wagtailcore', '0094_alter_page_locale'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogandnewsarticle',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='blogandnewsarticle',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='blog_article_search_idx'),
+        ),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+    ]
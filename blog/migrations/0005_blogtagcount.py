@@ -0,0 +1,41 @@
+# Generated by Django 5.1.1 on 2026-10-16 20:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_tag_counts(apps, schema_editor):
+    BlogPageTag = apps.get_model('blog', 'BlogPageTag')
+    BlogTagCount = apps.get_model('blog', 'BlogTagCount')
+    counts = (
+        BlogPageTag.objects.filter(content_object__live=True)
+        .values_list('tag_id')
+        .annotate(count=Count('id'))
+    )
+    BlogTagCount.objects.bulk_create(
+        BlogTagCount(tag_id=tag_id, count=count) for tag_id, count in counts
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_blogandnewsarticle_search_vector'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlogTagCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='taggit.tag')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-count'], name='blog_tagcount_count_idx')],
+            },
+        ),
+        migrations.RunPython(build_tag_counts, migrations.RunPython.noop),
+    ]
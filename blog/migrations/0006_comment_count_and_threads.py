@@ -0,0 +1,54 @@
+# Generated by Django 5.1.1 on 2026-10-16 20:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_comment_threads(apps, schema_editor):
+    BlogAndNewsArticle = apps.get_model('blog', 'BlogAndNewsArticle')
+    Comment = apps.get_model('blog', 'Comment')
+
+    # Point every reply at the top-level comment of its thread
+    parents = dict(Comment.objects.values_list('id', 'parent_id'))
+    for comment_id, parent_id in parents.items():
+        if parent_id is None:
+            continue
+        root_id = parent_id
+        while parents.get(root_id) is not None:
+            root_id = parents[root_id]
+        Comment.objects.filter(pk=comment_id).update(root_id=root_id)
+
+    counts = (
+        Comment.objects.filter(page_id=OuterRef('pk'))
+        .values('page_id')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    BlogAndNewsArticle.objects.update(comment_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_blogtagcount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogandnewsarticle',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='root',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='thread_comments', to='blog.comment'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('parent__isnull', True)), fields=['page', '-created_at'], name='blog_comment_toplevel_idx'),
+        ),
+        migrations.RunPython(backfill_comment_threads, migrations.RunPython.noop),
+    ]
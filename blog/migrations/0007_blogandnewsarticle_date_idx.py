@@ -0,0 +1,19 @@
+# Generated by Django 5.1.1 on 2026-10-16 20:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_comment_count_and_threads'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+        ('wagtailcore', '0094_alter_page_locale'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogandnewsarticle',
+            index=models.Index(fields=['-date', '-page_ptr'], name='blog_article_date_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.1 on 2026-10-16 20:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_neighbours(apps, schema_editor):
+    BlogAndNewsArticle = apps.get_model('blog', 'BlogAndNewsArticle')
+    live_ids = list(BlogAndNewsArticle.objects.filter(live=True).order_by('date', 'pk').values_list('pk', flat=True))
+    for i, pk in enumerate(live_ids):
+        BlogAndNewsArticle.objects.filter(pk=pk).update(
+            previous_article_id=live_ids[i - 1] if i > 0 else None,
+            next_article_id=live_ids[i + 1] if i + 1 < len(live_ids) else None,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_blogandnewsarticle_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogandnewsarticle',
+            name='next_article',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='blog.blogandnewsarticle'),
+        ),
+        migrations.AddField(
+            model_name='blogandnewsarticle',
+            name='previous_article',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='blog.blogandnewsarticle'),
+        ),
+        migrations.RunPython(link_neighbours, migrations.RunPython.noop),
+    ]
@@ -8,6 +8,7 @@ from django import forms
 
 from modelcluster.fields import ParentalKey, ParentalManyToManyField
 from modelcluster.contrib.taggit import ClusterTaggableManager
+from modelcluster.models import get_all_child_m2m_relations, get_all_child_relations
 from taggit.models import TaggedItemBase
 
 from wagtail.models import Page, Orderable
@@ -15,54 +16,91 @@ from wagtail.fields import RichTextField
 from wagtail.admin.panels import FieldPanel, InlinePanel, MultiFieldPanel
 from wagtail.search import index
 from wagtail.snippets.models import register_snippet 
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse
+from django.core.cache import cache
 from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+from django.db import connection, transaction
+from django.db.models import Count, F, Prefetch, Value
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, SearchVectorField
+from django.utils.html import strip_tags
+from wagtail.images import get_image_model
+
+from base import responsive_images
 
 from django.shortcuts import render
 
+from .pagination import paginate_by_cursor
+
+# Cache key of the number of live articles, cleared on publish/unpublish/delete
+ARTICLE_TOTAL_CACHE_KEY = 'blog:live-article-count'
+
+
 class BlogIndex(Page):
+    ARTICLES_PER_PAGE = 2
+
     def get_context(self, request):
         context = super().get_context(request)
 
         # Get all blog articles
-        blogarticles = BlogAndNewsArticle.objects.all()
+        blogarticles = BlogAndNewsArticle.objects.live()
 
         # Check for a tag filter in the GET request
         tag_filter = request.GET.get('tag', None)
         if tag_filter:
-            blogarticles = BlogAndNewsArticle.objects.filter(tags__name=tag_filter)
+            blogarticles = blogarticles.filter(tags__name=tag_filter)
             
         
             
         search_query = request.GET.get('search', None)
         if search_query:
-            blogarticles = blogarticles.filter(
-                models.Q(title__icontains=search_query) |  # Search in title
-                models.Q(body__icontains=search_query)     # Search in body/description
+            # Search results are ordered by rank, so they keep numbered pages
+            blogarticles = BlogAndNewsArticle.search(blogarticles, search_query)
+            paginator = Paginator(blogarticles, self.ARTICLES_PER_PAGE)
+            page_obj = paginator.get_page(request.GET.get("page"))
+            context['page_obj'] = page_obj
+        else:
+            page_obj = paginate_by_cursor(
+                blogarticles,
+                self.ARTICLES_PER_PAGE,
+                after=request.GET.get('after'),
+                before=request.GET.get('before'),
             )
-            
-        paginator = Paginator(blogarticles, 2)  # Show 25 contacts per page.
+            context['cursor_page'] = page_obj
+            context['article_total'] = self.get_article_total(tag_filter)
 
-        page_number = request.GET.get("page")
-        page_obj = paginator.get_page(page_number)
-            
+        # Load images and tags for the whole page in one go
+        page_obj.object_list = BlogAndNewsArticle.load_listing(page_obj.object_list)
 
         context['blogarticles'] = page_obj
-        context['page_obj'] = page_obj
         context['all_tags'] = self.get_all_tags()  # Add all tags to the context for filtering
         
 
         return context
 
+    def serve(self, request, *args, **kwargs):
+        if request.GET.get('format') == 'json':
+            # Next batch of articles for infinite scrolling
+            context = self.get_context(request)
+            cursor_page = context.get('cursor_page')
+            return JsonResponse({
+                'html': render_to_string('blog/includes/article_list.html', context, request=request),
+                'next_cursor': cursor_page.next_cursor if cursor_page else None,
+            })
+        return super().serve(request, *args, **kwargs)
+
+    @staticmethod
+    def get_article_total(tag=None):
+        """Number of live articles (with the given tag), without counting them on every request."""
+        if tag:
+            return BlogTagCount.objects.filter(tag__name=tag).values_list('count', flat=True).first() or 0
+        return cache.get_or_set(ARTICLE_TOTAL_CACHE_KEY, lambda: BlogAndNewsArticle.objects.live().count(), 60 * 60)
+
     @staticmethod
     def get_all_tags():
-        """Return all unique tags from all blog and news articles, along with the number of times each tag is used."""
-        return (
-            BlogAndNewsArticle.objects.live()
-            .values('tags__name')  # Group by the tag name
-            .annotate(tag_count=models.Count('tags'))  # Count how many times each tag is used
-            .order_by('-tag_count')  # Optional: order by the most used tags
-        )
+        """Return all tags used by live articles, along with the number of articles using each."""
+        return BlogTagCount.get_tag_counts()
 
     
 class BlogPageTag(TaggedItemBase):
@@ -79,8 +117,27 @@ class BlogAndNewsArticle(Page):
     authors = ParentalManyToManyField('blog.Author', blank=True)
     tags = ClusterTaggableManager(through=BlogPageTag, blank=True)
     parent_page_types = ['blog.BlogIndex']  # Restrict to BlogIndex as the parent
+
+    # Responsive image profile of the article picture on the blog listing
+    LISTING_IMAGE_PROFILE = 'listing'
+
+    # Number of top-level comment threads shown per page of comments
+    COMMENTS_PER_PAGE = 20
+
+    # Postgres text search configuration used for the blog search
+    SEARCH_CONFIG = 'english'
+    # Weighted tsvector over title (A), intro (B) and body text (C),
+    # maintained by update_search_vector on publish
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Maintained by Comment.save and the comment post_delete signal
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    # Neighbouring live articles in (date, id) order, maintained by refresh_neighbours
+    previous_article = models.ForeignKey('self', null=True, blank=True, editable=False, on_delete=models.SET_NULL, related_name='+')
+    next_article = models.ForeignKey('self', null=True, blank=True, editable=False, on_delete=models.SET_NULL, related_name='+')
     
     def main_image(self):
+        if hasattr(self, '_main_image'):
+            return self._main_image  # Set by load_listing
         gallery_item = self.gallery_images.first()
         if gallery_item:
             return gallery_item.image 
@@ -102,9 +159,15 @@ class BlogAndNewsArticle(Page):
         
         InlinePanel('gallery_images', label="Gallery images"),
     ]
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='blog_article_search_idx'),
+            # Keyset pagination of the blog index
+            models.Index(fields=['-date', '-page_ptr'], name='blog_article_date_idx'),
+        ]
+
     def serve(self, request):
-        # Fetch the comments related to this article
-        comments = self.comments.filter(parent__isnull=True)  # Top-level comments
         from .forms import CommentForm
         # Handle form submission
         if request.method == 'POST':
@@ -113,41 +176,254 @@ class BlogAndNewsArticle(Page):
             if form.is_valid():
                 comment = form.save(commit=False)
                 comment.page = self
+                if comment.parent and comment.parent.page_id != self.pk:
+                    comment.parent = None  # Only reply to comments on this article
                 comment.save()
                 return HttpResponseRedirect(request.path)
         else:
             form = CommentForm()
 
+        previous_article, next_article = self.get_neighbours()
         return render(request, self.get_template(request), {
             'page': self,
             'form': form,
-            'comments': comments,
+            'comments': self.get_comment_threads(request.GET.get('comments')),
+            'previous_article': previous_article,
+            'next_article': next_article,
             
         })
+
+    # Written by UPDATE queries of their own, never by saving the page, so a
+    # publish can't overwrite them with the values the page was loaded with
+    MAINTAINED_FIELDS = {'search_vector', 'comment_count', 'previous_article', 'next_article'}
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = (
+                [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in BlogAndNewsArticle.MAINTAINED_FIELDS
+                ]
+                # Committed by a full save, so they have to be named too
+                + [relation.get_accessor_name() for relation in get_all_child_relations(self)]
+                + [field.name for field in get_all_child_m2m_relations(self)]
+            )
+        return super().save(*args, **kwargs)
+
+    def serializable_data(self):
+        # Comments are visitor content, not part of the page revisions
+        data = super().serializable_data()
+        data.pop('comments', None)
+        return data
+
+    def with_content_json(self, content):
+        content = dict(content)
+        content.pop('comments', None)  # Stored by revisions made before serializable_data dropped it
+        obj = super().with_content_json(content)
+        # These are maintained outside of revisions, keep the current values
+        obj.comment_count = self.comment_count
+        obj.search_vector = self.search_vector
+        obj.previous_article_id = self.previous_article_id
+        obj.next_article_id = self.next_article_id
+        return obj
+
     def get_comment_count(self):
-        return self.comments.count()
+        return self.comment_count
+
+    def get_comment_threads(self, page_number=None):
+        """
+        Return a page of top-level comments, newest first. Each comment gets a
+        ``thread_replies`` list holding its replies (nested the same way),
+        loaded for the whole page in a single query.
+        """
+        top_level = Comment.objects.filter(page_id=self.pk, parent__isnull=True).order_by('-created_at')
+        comment_page = Paginator(top_level, BlogAndNewsArticle.COMMENTS_PER_PAGE).get_page(page_number)
+        roots = list(comment_page.object_list)
+
+        replies_by_parent = {}
+        for reply in Comment.objects.filter(root__in=roots).order_by('created_at'):
+            replies_by_parent.setdefault(reply.parent_id, []).append(reply)
+        for comment in roots:
+            comment.thread_replies = replies_by_parent.get(comment.pk, [])
+        for replies in list(replies_by_parent.values()):
+            for reply in replies:
+                reply.thread_replies = replies_by_parent.get(reply.pk, [])
+
+        comment_page.object_list = roots
+        return comment_page
+
+    def get_tags(self):
+        if hasattr(self, '_tags'):
+            return self._tags  # Set by load_listing
+        return self.tags.all()
+
+    def update_search_vector(self):
+        """Recompute the stored search vector from the current field values."""
+        if connection.vendor != 'postgresql':
+            return
+        config = BlogAndNewsArticle.SEARCH_CONFIG
+        BlogAndNewsArticle.objects.filter(pk=self.pk).update(
+            search_vector=(
+                SearchVector(Value(self.title), weight='A', config=config)
+                + SearchVector(Value(self.intro or ''), weight='B', config=config)
+                + SearchVector(Value(strip_tags(self.body or '')), weight='C', config=config)
+            )
+        )
+
+    @staticmethod
+    def search(articles, search_query):
+        """Filter articles by the search query, best matches first."""
+        if connection.vendor != 'postgresql':
+            return articles.filter(
+                models.Q(title__icontains=search_query) |  # Search in title
+                models.Q(body__icontains=search_query)     # Search in body/description
+            )
+        query = SearchQuery(search_query, search_type='websearch', config=BlogAndNewsArticle.SEARCH_CONFIG)
+        return (
+            articles.filter(search_vector=query)
+            .annotate(rank=SearchRank(F('search_vector'), query))
+            .order_by('-rank', '-date')
+        )
+
+    @staticmethod
+    def load_listing(articles, image_filters=None, with_tags=True):
+        """
+        Attach the main image (with its renditions) and tags to each article, so that rendering a listing costs a fixed number of
+        queries no matter how many articles are on the page.
+        """
+        articles = list(articles)
+        if not articles:
+            return articles
+        if image_filters is None:
+            image_filters = responsive_images.get_filter_specs(BlogAndNewsArticle.LISTING_IMAGE_PROFILE)
+        article_ids = [article.pk for article in articles]
+
+        # First gallery image of every article, with the renditions we need
+        rendition_model = get_image_model().get_rendition_model()
+        gallery_items = (
+            BlogPageGalleryImage.objects.filter(page_id__in=article_ids)
+            .select_related('image')
+            .prefetch_related(Prefetch(
+                'image__renditions',
+                queryset=rendition_model.objects.filter(filter_spec__in=image_filters),
+                to_attr='prefetched_renditions',
+            ))
+            .order_by('page_id', 'sort_order')
+        )
+        main_images = {}
+        for gallery_item in gallery_items:
+            main_images.setdefault(gallery_item.page_id, gallery_item.image)
+
+        for article in articles:
+            article._main_image = main_images.get(article.pk)
+        if not with_tags:
+            return articles
+
+        tags = {}
+        for tagged_item in (
+            BlogPageTag.objects.filter(content_object_id__in=article_ids)
+            .select_related('tag')
+            .order_by('tag__name')
+        ):
+            tags.setdefault(tagged_item.content_object_id, []).append(tagged_item.tag)
+        for article in articles:
+            article._tags = tags.get(article.pk, [])
+        return articles
 
     def get_comments(self):
         return self.comments.all().order_by('-created_at')
     
     def get_previous_article(self):
         """Get the previous article based on the date"""
-        return BlogAndNewsArticle.objects.live().filter(date__lt=self.date).order_by('-date').first()
+        return self.previous_article
 
     def get_next_article(self):
         """Get the next article based on the date"""
-        return BlogAndNewsArticle.objects.live().filter(date__gt=self.date).order_by('date').first()
+        return self.next_article
+
+    def get_neighbours(self):
+        """Return the previous and next article, with their main images loaded."""
+        neighbour_ids = [pk for pk in (self.previous_article_id, self.next_article_id) if pk]
+        if not neighbour_ids:
+            return None, None
+        neighbours = {
+            article.pk: article
+            for article in BlogAndNewsArticle.load_listing(
+                BlogAndNewsArticle.objects.live().filter(pk__in=neighbour_ids),
+                image_filters=responsive_images.get_filter_specs('thumbnail'),
+                with_tags=False,
+            )
+        }
+        return neighbours.get(self.previous_article_id), neighbours.get(self.next_article_id)
+
+    @staticmethod
+    def refresh_neighbours():
+        """
+        Recompute the previous/next links of every article from the live
+        articles in (date, id) order. Only the links that changed are written.
+        """
+        live_ids = list(BlogAndNewsArticle.objects.live().order_by('date', 'pk').values_list('pk', flat=True))
+        links = {
+            pk: (live_ids[i - 1] if i > 0 else None, live_ids[i + 1] if i + 1 < len(live_ids) else None)
+            for i, pk in enumerate(live_ids)
+        }
+        current = BlogAndNewsArticle.objects.values_list('pk', 'previous_article_id', 'next_article_id')
+        with transaction.atomic():
+            for pk, previous_id, next_id in current:
+                new_links = links.get(pk, (None, None))
+                if (previous_id, next_id) != new_links:
+                    BlogAndNewsArticle.objects.filter(pk=pk).update(
+                        previous_article_id=new_links[0], next_article_id=new_links[1]
+                    )
     
     @staticmethod
     def get_all_tags():
-        """Return all unique tags from all blog and news articles, along with the number of times each tag is used."""
-        return (
-            BlogAndNewsArticle.objects.live()
-            .values('tags__name')  # Group by the tag name
-            .annotate(tag_count=models.Count('tags'))  # Count how many times each tag is used
-            .order_by('-tag_count')  # Optional: order by the most used tags
-        )
+        """Return all tags used by live articles, along with the number of articles using each."""
+        return BlogTagCount.get_tag_counts()
         
+class BlogTagCount(models.Model):
+    """
+    Number of live articles using each tag, kept up to date by the publish,
+    unpublish and delete signal handlers so the tag sidebar is a single read.
+    """
+    tag = models.OneToOneField('taggit.Tag', on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-count'], name='blog_tagcount_count_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tag} ({self.count})"
+
+    @staticmethod
+    def get_tag_counts():
+        return BlogTagCount.objects.select_related('tag').order_by('-count', 'tag__name')
+
+    @staticmethod
+    def refresh(tag_ids=None):
+        """Recount the given tags, or every tag when no ids are passed."""
+        tagged_items = BlogPageTag.objects.all()
+        if tag_ids is not None:
+            tag_ids = set(tag_ids)
+            if not tag_ids:
+                return
+            tagged_items = tagged_items.filter(tag_id__in=tag_ids)
+        counts = dict(
+            tagged_items.filter(content_object__live=True)
+            .values_list('tag_id')
+            .annotate(count=Count('id'))
+        )
+        with transaction.atomic():
+            stale = BlogTagCount.objects.exclude(tag_id__in=counts.keys())
+            if tag_ids is not None:
+                stale = stale.filter(tag_id__in=tag_ids)
+            stale.delete()
+            for tag_id, count in counts.items():
+                BlogTagCount.objects.update_or_create(tag_id=tag_id, defaults={'count': count})
+
+
 class BlogPageGalleryImage(Orderable):
     page = ParentalKey(BlogAndNewsArticle, on_delete=models.CASCADE, related_name='gallery_images')
     image = models.ForeignKey(
@@ -194,9 +470,31 @@ class Comment(models.Model):
     comment_text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     parent = models.ForeignKey('self', null=True, blank=True, related_name='replies', on_delete=models.CASCADE)
+    # Top-level comment of the thread, so a whole thread loads in one query
+    root = models.ForeignKey('self', null=True, blank=True, editable=False, related_name='thread_comments', on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['page', '-created_at'],
+                name='blog_comment_toplevel_idx',
+                condition=models.Q(parent__isnull=True),
+            ),
+        ]
 
     def __str__(self):
         return f"Comment by {self.name}"
 
+    def save(self, *args, **kwargs):
+        if self.parent_id:
+            self.root_id = self.parent.root_id or self.parent_id
+        else:
+            self.root_id = None
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                BlogAndNewsArticle.objects.filter(pk=self.page_id).update(comment_count=F('comment_count') + 1)
+
     def is_reply(self):
         return self.parent is not None
\ No newline at end of file
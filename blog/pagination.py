@@ -0,0 +1,71 @@
+import datetime
+
+from django.db.models import Q
+
+
+class CursorPage:
+    """
+    A page of articles in (date, id) order, newest first. Unlike Django's
+    Paginator it never counts or skips rows, so every page is an index range
+    scan of the same cost.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def encode_cursor(article):
+    return f'{article.date.isoformat()}.{article.pk}'
+
+
+def decode_cursor(cursor):
+    """Return the (date, id) in a cursor, or None if it is not valid."""
+    try:
+        date, pk = cursor.split('.')
+        return datetime.date.fromisoformat(date), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def paginate_by_cursor(articles, per_page, after=None, before=None):
+    """Return the articles following the ``after`` cursor, or preceding the ``before`` one."""
+    after, before = decode_cursor(after), decode_cursor(before)
+    if before:
+        date, pk = before
+        rows = list(
+            articles.filter(Q(date__gt=date) | Q(date=date, pk__gt=pk))
+            .order_by('date', 'pk')[:per_page + 1]
+        )
+        more_before = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        return CursorPage(
+            rows,
+            next_cursor=encode_cursor(rows[-1]) if rows else None,
+            previous_cursor=encode_cursor(rows[0]) if rows and more_before else None,
+        )
+
+    if after:
+        date, pk = after
+        articles = articles.filter(Q(date__lt=date) | Q(date=date, pk__lt=pk))
+    rows = list(articles.order_by('-date', '-pk')[:per_page + 1])
+    more_after = len(rows) > per_page
+    rows = rows[:per_page]
+    return CursorPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1]) if more_after else None,
+        previous_cursor=encode_cursor(rows[0]) if rows and after else None,
+    )
@@ -0,0 +1,49 @@
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.signals import post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+from wagtail.signals import page_published, page_unpublished
+
+from .models import ARTICLE_TOTAL_CACHE_KEY, BlogAndNewsArticle, BlogPageTag, BlogTagCount, Comment
+
+
+def _article_tag_ids(article):
+    return set(BlogPageTag.objects.filter(content_object_id=article.pk).values_list('tag_id', flat=True))
+
+
+@receiver(page_published, sender=BlogAndNewsArticle)
+def update_article_search_vector(sender, instance, **kwargs):
+    # Keep the full-text search column in step with the published content
+    instance.update_search_vector()
+
+
+@receiver(pre_save, sender=BlogAndNewsArticle)
+@receiver(pre_delete, sender=BlogAndNewsArticle)
+def remember_article_tags(sender, instance, **kwargs):
+    # Tags removed by this save/delete still need their counts refreshed
+    if instance.pk:
+        instance._previous_tag_ids = _article_tag_ids(instance)
+
+
+@receiver(page_published, sender=BlogAndNewsArticle)
+@receiver(page_unpublished, sender=BlogAndNewsArticle)
+@receiver(post_delete, sender=BlogAndNewsArticle)
+def refresh_article_counts(sender, instance, **kwargs):
+    BlogTagCount.refresh(getattr(instance, '_previous_tag_ids', set()) | _article_tag_ids(instance))
+    cache.delete(ARTICLE_TOTAL_CACHE_KEY)
+
+
+@receiver(page_published, sender=BlogAndNewsArticle)
+@receiver(page_unpublished, sender=BlogAndNewsArticle)
+@receiver(post_delete, sender=BlogAndNewsArticle)
+def refresh_article_neighbours(sender, **kwargs):
+    # Publishing can change an article's date, so relink the whole sequence
+    BlogAndNewsArticle.refresh_neighbours()
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_article_comment_count(sender, instance, **kwargs):
+    # Runs inside the deletion transaction, replies deleted by cascade included
+    BlogAndNewsArticle.objects.filter(pk=instance.page_id, comment_count__gt=0).update(
+        comment_count=F('comment_count') - 1
+    )
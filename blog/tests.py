@@ -1,3 +1,258 @@
-from django.test import TestCase
+import datetime
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.test import TestCase, override_settings
+from wagtail.models import Site
+
+from .models import BlogAndNewsArticle, BlogIndex, BlogTagCount, Comment
+from .pagination import paginate_by_cursor
+
+# Page caches and the article total are kept out of the project's file cache
+LOCMEM_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'blog-tests-{alias}'}
+    for alias in settings.CACHES
+}
+# Pages link static files that only have manifest entries after collectstatic
+NO_MANIFEST_STORAGES = {
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BlogTestCase(TestCase):
+    def setUp(self):
+        home = Site.objects.get(is_default_site=True).root_page
+        self.index = home.add_child(instance=BlogIndex(title="Stories", slug="stories"))
+
+    def add_article(self, title, date=datetime.date(2024, 1, 1), intro="An article", body="<p>Some news</p>", tags=()):
+        """Add a live article and publish it, as the editors do."""
+        article = BlogAndNewsArticle(title=title, date=date, intro=intro, body=body)
+        self.index.add_child(instance=article)
+        article.tags.add(*tags)
+        article.save_revision().publish()
+        return BlogAndNewsArticle.objects.get(pk=article.pk)
+
+    def publish(self, article, **changes):
+        for name, value in changes.items():
+            setattr(article, name, value)
+        article.save_revision().publish()
+        return BlogAndNewsArticle.objects.get(pk=article.pk)
+
+    def search(self, query):
+        return list(BlogAndNewsArticle.search(BlogAndNewsArticle.objects.live(), query))
+
+
+class SearchVectorTests(BlogTestCase):
+    def test_published_article_is_found_by_title_intro_and_body(self):
+        article = self.add_article("Malaria nets", intro="Sleeping safely", body="<p>Distributed in <b>Kisumu</b></p>")
+
+        self.assertEqual(self.search("malaria"), [article])
+        self.assertEqual(self.search("sleeping"), [article])
+        self.assertEqual(self.search("kisumu"), [article])
+
+    def test_title_match_ranks_above_body_match(self):
+        in_body = self.add_article("Clinic day", body="<p>Talking about vaccines</p>")
+        in_title = self.add_article("Vaccines for all", body="<p>A long day</p>")
+
+        self.assertEqual(self.search("vaccines"), [in_title, in_body])
+
+    def test_vector_follows_the_published_revision(self):
+        article = self.add_article("Water", body="<p>Wells dug</p>")
+
+        article = self.publish(article, body="<p>Filters handed out</p>")
+
+        self.assertEqual(self.search("filters"), [article])
+        self.assertEqual(self.search("wells"), [])
+
+    def test_draft_changes_are_not_searchable(self):
+        article = self.add_article("Water", body="<p>Wells dug</p>")
+
+        article.body = "<p>Filters handed out</p>"
+        article.save_revision()
+
+        self.assertEqual(self.search("filters"), [])
+        self.assertEqual(self.search("wells"), [article])
+
+    def test_unpublished_article_is_not_found(self):
+        article = self.add_article("Malaria nets")
+
+        article.unpublish()
+
+        self.assertEqual(self.search("malaria"), [])
+
+
+class TagCountTests(BlogTestCase):
+    def tag_counts(self):
+        return {tag_count.tag.name: tag_count.count for tag_count in BlogTagCount.get_tag_counts()}
+
+    def test_publishing_counts_the_tags(self):
+        self.add_article("One", tags=["health", "water"])
+        self.add_article("Two", tags=["health"])
+
+        self.assertEqual(self.tag_counts(), {"health": 2, "water": 1})
+
+    def test_retagging_moves_the_counts(self):
+        article = self.add_article("One", tags=["health", "water"])
+        self.add_article("Two", tags=["health"])
+
+        article.tags.set(["water", "schools"])
+        self.publish(article)
+
+        self.assertEqual(self.tag_counts(), {"health": 1, "water": 1, "schools": 1})
+
+    def test_draft_tag_changes_are_not_counted(self):
+        article = self.add_article("One", tags=["health"])
+
+        article.tags.set(["schools"])
+        article.save_revision()
+
+        self.assertEqual(self.tag_counts(), {"health": 1})
+
+    def test_unpublishing_removes_the_counts(self):
+        article = self.add_article("One", tags=["health", "water"])
+        self.add_article("Two", tags=["health"])
+
+        article.unpublish()
+
+        self.assertEqual(self.tag_counts(), {"health": 1})
+
+    def test_deleting_removes_the_counts(self):
+        article = self.add_article("One", tags=["health"])
+
+        article.delete()
+
+        self.assertEqual(self.tag_counts(), {})
+
+    def test_article_total_of_a_tag(self):
+        article = self.add_article("One", tags=["health"])
+        self.add_article("Two", tags=["health"])
+        self.assertEqual(BlogIndex.get_article_total("health"), 2)
+
+        article.unpublish()
+
+        self.assertEqual(BlogIndex.get_article_total("health"), 1)
+        self.assertEqual(BlogIndex.get_article_total(), 1)
+
+
+class CommentCountTests(BlogTestCase):
+    def add_comment(self, article, parent=None):
+        return Comment.objects.create(
+            page=article, parent=parent, name="Visitor", email="visitor@example.com", comment_text="Thanks!"
+        )
+
+    def comment_count(self, article):
+        return BlogAndNewsArticle.objects.get(pk=article.pk).comment_count
+
+    def test_comments_and_replies_are_counted(self):
+        article = self.add_article("One")
+        comment = self.add_comment(article)
+        self.add_comment(article, parent=comment)
+
+        self.assertEqual(self.comment_count(article), 2)
+
+    def test_deleting_a_reply(self):
+        article = self.add_article("One")
+        comment = self.add_comment(article)
+        reply = self.add_comment(article, parent=comment)
+
+        reply.delete()
+
+        self.assertEqual(self.comment_count(article), 1)
+
+    def test_deleting_a_comment_with_replies(self):
+        article = self.add_article("One")
+        comment = self.add_comment(article)
+        reply = self.add_comment(article, parent=comment)
+        self.add_comment(article, parent=reply)
+        self.add_comment(article)
+
+        comment.delete()
+
+        self.assertEqual(self.comment_count(article), 1)
+
+    def test_deleting_comments_in_bulk(self):
+        article = self.add_article("One")
+        other = self.add_article("Two")
+        for _ in range(3):
+            self.add_comment(article)
+        self.add_comment(other)
+
+        Comment.objects.filter(page=article).delete()
+
+        self.assertEqual(self.comment_count(article), 0)
+        self.assertEqual(self.comment_count(other), 1)
+
+    def test_count_survives_publishing(self):
+        article = self.add_article("One")
+        self.add_comment(article)
+
+        self.publish(article, intro="Updated")
+
+        self.assertEqual(self.comment_count(article), 1)
+
+
+class CursorPaginationTests(BlogTestCase):
+    def setUp(self):
+        super().setUp()
+        # Several articles on the same day, to check the id breaks the ties
+        dates = [datetime.date(2024, 1, day) for day in (1, 2, 2, 2, 3, 5, 5)]
+        for number, date in enumerate(dates):
+            article = BlogAndNewsArticle(title=f"Article {number}", date=date, intro="An article", body="<p>News</p>")
+            self.index.add_child(instance=article)
+        self.newest_first = list(BlogAndNewsArticle.objects.live().order_by('-date', '-pk'))
+
+    def paginate(self, after=None, before=None):
+        return paginate_by_cursor(BlogAndNewsArticle.objects.live(), 3, after=after, before=before)
+
+    def test_following_next_cursors_visits_every_article_once(self):
+        pages = [self.paginate()]
+        while pages[-1].has_next():
+            pages.append(self.paginate(after=pages[-1].next_cursor))
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual([article for page in pages for article in page], self.newest_first)
+        self.assertFalse(pages[0].has_previous())
+
+    def test_previous_cursor_goes_back_to_the_same_page(self):
+        first = self.paginate()
+        second = self.paginate(after=first.next_cursor)
+        third = self.paginate(after=second.next_cursor)
+
+        back_to_second = self.paginate(before=third.previous_cursor)
+        back_to_first = self.paginate(before=back_to_second.previous_cursor)
+
+        self.assertEqual(list(back_to_second), list(second))
+        self.assertEqual(back_to_second.next_cursor, second.next_cursor)
+        self.assertEqual(list(back_to_first), list(first))
+        self.assertFalse(back_to_first.has_previous())
+        self.assertTrue(back_to_first.has_next())
+
+    def test_article_published_meanwhile_does_not_shift_the_next_page(self):
+        first = self.paginate()
+        self.index.add_child(instance=BlogAndNewsArticle(
+            title="Breaking", date=datetime.date(2024, 2, 1), intro="New", body="<p>News</p>"
+        ))
+
+        second = self.paginate(after=first.next_cursor)
+
+        self.assertEqual(list(second), self.newest_first[3:6])
+
+    def test_invalid_cursor_gives_the_first_page(self):
+        for cursor in ("nonsense", "2024-13-01.1", "2024-01-01.x", "2024-01-01"):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(list(self.paginate(after=cursor)), self.newest_first[:3])
+
+    @override_settings(STORAGES=NO_MANIFEST_STORAGES)
+    @mock.patch.object(BlogIndex, 'ARTICLES_PER_PAGE', 3)
+    def test_infinite_scroll_batches(self):
+        first = self.client.get(self.index.url, {'format': 'json'}).json()
+        second = self.client.get(self.index.url, {'format': 'json', 'after': first['next_cursor']}).json()
+        last = self.client.get(self.index.url, {'format': 'json', 'after': second['next_cursor']}).json()
+
+        self.assertIn("Article 6", first['html'])
+        self.assertIn("Article 3", second['html'])
+        self.assertNotIn("Article 6", second['html'])
+        self.assertIn("Article 0", last['html'])
+        self.assertIsNone(last['next_cursor'])
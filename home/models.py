@@ -8,6 +8,7 @@ from wagtail.fields import StreamField
 from wagtail.admin.panels import FieldPanel
 from snippets.models import OurService
 from blog.models import BlogAndNewsArticle
+from base import responsive_images
 
 class HomePage(Page):
     hero_block = StreamField(
@@ -68,6 +69,7 @@ class HomePage(Page):
 
         # Fetch the two latest blog articles
         articles = BlogAndNewsArticle.objects.live().order_by('-first_published_at')[:2]
+        articles = BlogAndNewsArticle.load_listing(articles, image_filters=responsive_images.get_filter_specs('card'))
         
         # Add the articles to the context
         context['blog_articles'] = articles
@@ -51,11 +51,15 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    # Trigram operator classes on the Inbox indexes, see base/models.py
+    "django.contrib.postgres",
     "wagtail.contrib.settings",
     'wagtail_modeladmin',
 ]
 
 MIDDLEWARE = [
+    # Serves STATIC_ROOT when DEBUG is off, see base/static_files.py
+    "base.static_files.StaticFilesMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -64,6 +68,7 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "wagtail.contrib.redirects.middleware.RedirectMiddleware",
+    "base.page_cache.PageCacheMiddleware",
 ]
 
 ROOT_URLCONF = "passion4health.urls"
@@ -105,6 +110,44 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# A file based cache is shared by all gunicorn workers in the container, so
+# invalidating a page in one worker is seen by the others.
+
+CACHES = {
+    # Pages, fragments, settings and SVG markup: a few query variants of some
+    # hundreds of pages, culled past MAX_ENTRIES
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(BASE_DIR, "cache"),
+        "OPTIONS": {
+            "MAX_ENTRIES": 5000,
+        },
+    },
+    # Versions of the page cache tags (one per page and snippet), never expire
+    # and are far below MAX_ENTRIES, so they are never culled
+    "page_cache_versions": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(BASE_DIR, "cache", "versions"),
+        "TIMEOUT": None,
+        "OPTIONS": {
+            "MAX_ENTRIES": 1000000,
+        },
+    },
+}
+
+# Full-response cache for anonymous page views, see base/page_cache.py for the
+# query parameters it varies on
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_TIMEOUT = 60 * 10
+PAGE_CACHE_VERSIONS_ALIAS = "page_cache_versions"
+# How long shared caches (CDN, proxies) may keep a public page. Pages carry no
+# CSRF token (forms fetch one from api/csrf/), so they are the same for every
+# anonymous visitor.
+PAGE_CACHE_SHARED_MAX_AGE = 60 * 5
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -150,6 +193,8 @@ STATICFILES_DIRS = [
 
 STATIC_ROOT = os.path.join(BASE_DIR, "static")
 STATIC_URL = "/static/"
+# Browser cache lifetime of static files without a hash in their name
+STATIC_FILES_MAX_AGE = 60
 
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 MEDIA_URL = "/media/"
@@ -164,8 +209,59 @@ STORAGES = {
     # outdated JavaScript / CSS assets being served from cache
     # (e.g. after a Wagtail upgrade).
     # See https://docs.djangoproject.com/en/5.1/ref/contrib/staticfiles/#manifeststaticfilesstorage
+    # It also builds the STATIC_BUNDLES below (see base/static_bundles.py) and
+    # writes gzip and brotli copies of the files (see base/static_files.py).
     "staticfiles": {
-        "BACKEND": "django.contrib.staticfiles.storage.ManifestStaticFilesStorage",
+        "BACKEND": "base.static_files.CompressedManifestStaticFilesStorage",
+    },
+}
+
+# Stylesheets and scripts of each page type, in order, minified into one file each by
+# collectstatic. Templates link them with {% static_bundle %}, which links the separate
+# files instead while DEBUG is on (or STATIC_BUNDLES_ENABLED is False).
+_BUNDLE_CSS = [
+    "css/passion4health.css",
+    "assets/css/bootstrap.min.css",
+    "assets/css/slicknav.css",
+    "assets/css/flaticon.css",
+    "assets/css/animate.min.css",
+    "assets/css/fontawesome-all.min.css",
+    "assets/css/themify-icons.css",
+]
+_BUNDLE_JS = [
+    "js/passion4health.js",
+    "assets/js/vendor/modernizr-3.5.0.min.js",
+    "assets/js/vendor/jquery-1.12.4.min.js",
+    "assets/js/popper.min.js",
+    "assets/js/bootstrap.min.js",
+    "assets/js/jquery.slicknav.min.js",
+    "assets/js/wow.min.js",
+    "assets/js/waypoints.min.js",
+    "assets/js/jquery.counterup.min.js",
+]
+_BUNDLE_MAIN_JS = [
+    "assets/js/plugins.js",
+    "assets/js/main.js",
+]
+STATIC_BUNDLES = {
+    # Every page without a bundle of its own, the blog included
+    "core": {
+        "css": _BUNDLE_CSS + ["assets/css/style.css"],
+        "js": _BUNDLE_JS + _BUNDLE_MAIN_JS,
+    },
+    # The hero slider
+    "home": {
+        "css": _BUNDLE_CSS + ["assets/css/slick.css", "assets/css/style.css"],
+        "js": _BUNDLE_JS + ["assets/js/slick.min.js"] + _BUNDLE_MAIN_JS,
+    },
+    # Validation of the contact form
+    "contact": {
+        "css": _BUNDLE_CSS + ["assets/css/style.css"],
+        "js": _BUNDLE_JS + [
+            "assets/js/jquery.form.js",
+            "assets/js/jquery.validate.min.js",
+            "assets/js/contact.js",
+        ] + _BUNDLE_MAIN_JS,
     },
 }
 
@@ -194,6 +290,23 @@ WAGTAILDOCS_EXTENSIONS = ['csv', 'docx', 'key', 'odt', 'pdf', 'pptx', 'rtf', 'tx
 
 WAGTAILIMAGES_EXTENSIONS = ['avif', 'gif', 'jpg', 'jpeg', 'png', 'webp', 'svg', 'ico']
 
+# Responsive images ({% responsive_image %}): modern formats offered alongside the
+# JPEG/PNG fallback, and the widths and sizes attribute of each kind of image
+RESPONSIVE_IMAGE_FORMATS = ["avif", "webp"]
+RESPONSIVE_IMAGE_PROFILES = {
+    "article": {"widths": [480, 730, 1100, 1460], "sizes": "(min-width: 1200px) 730px, (min-width: 992px) 610px, 100vw"},
+    "listing": {"widths": [480, 730, 1000, 1460], "sizes": "(min-width: 1200px) 730px, (min-width: 992px) 610px, 100vw"},
+    "card": {"widths": [360, 540, 720, 1080], "sizes": "(min-width: 1200px) 540px, (min-width: 768px) 50vw, 100vw"},
+    "half": {"widths": [250, 500, 750], "sizes": "(min-width: 992px) 500px, 90vw"},
+    "team": {"widths": [190, 380, 570], "ratio": (1, 1), "sizes": "(min-width: 1200px) 190px, (min-width: 576px) 50vw, 100vw"},
+    "thumbnail": {"widths": [60, 120], "ratio": (1, 1), "sizes": "60px"},
+    "avatar": {"widths": [90, 180], "ratio": (1, 1), "sizes": "90px"},
+}
+# Leave missing renditions to `manage.py process_rendition_jobs` (the "worker" process
+# in the Procfile) and show the original meanwhile, instead of resizing images during
+# requests
+RENDITIONS_IN_BACKGROUND = True
+
 
 
 # Email Backend Configuration for Zoho
@@ -47,6 +47,7 @@
 
   /* 4. MainSlider-1 */
   // h1-hero-active
+  // Plugins are only in the static bundles of the pages using them (see STATIC_BUNDLES)
   function mainSlider() {
     var BasicSlider = $('.slider-active');
     BasicSlider.on('init', function (e, slick) {
@@ -108,13 +109,15 @@
       });
     }
   }
-  mainSlider();
+  if ($.fn.slick) {
+    mainSlider();
+  }
 
 
 
   /* 5. Testimonial Active*/
   var testimonial = $('.h1-testimonial-active');
-  if (testimonial.length) {
+  if (testimonial.length && $.fn.slick) {
     testimonial.slick({
       dots: true,
       infinite: true,
@@ -160,18 +163,22 @@
 
   /* 6. Nice Selectorp  */
   var nice_Select = $('select');
-  if (nice_Select.length) {
+  if (nice_Select.length && $.fn.niceSelect) {
     nice_Select.niceSelect();
   }
 
-  /* 7. data-background */
+  /* 7. data-background, over its blurred placeholder until loaded */
   $("[data-background]").each(function () {
-    $(this).css("background-image", "url(" + $(this).attr("data-background") + ")")
+    var background = "url(" + $(this).attr("data-background") + ")";
+    var placeholder = $(this).attr("data-placeholder");
+    $(this).css("background-image", placeholder ? background + ", url(" + placeholder + ")" : background)
   });
 
 
   /* 10. WOW active */
-  new WOW().init();
+  if (typeof WOW !== 'undefined') {
+    new WOW().init();
+  }
 
   // 11. ---- Mailchimp js --------//  
 
@@ -179,7 +186,7 @@
 
   // 12 Pop Up Img
   var popUp = $('.single_gallery_part, .img-pop-up');
-  if (popUp.length) {
+  if (popUp.length && $.fn.magnificPopup) {
     popUp.magnificPopup({
       type: 'image',
       gallery: {
@@ -189,38 +196,47 @@
   }
   // 12 Pop Up Video
   var popUp = $('.popup-video');
-  if (popUp.length) {
+  if (popUp.length && $.fn.magnificPopup) {
     popUp.magnificPopup({
       type: 'iframe'
     });
   }
 
   /* 13. counterUp*/
-  $('.counter').counterUp({
-    delay: 10,
-    time: 3000
-  });
+  if ($.fn.counterUp) {
+    $('.counter').counterUp({
+      delay: 10,
+      time: 3000
+    });
+  }
 
   /* 14. Datepicker */
-  $('#datepicker1').datepicker();
+  if ($.fn.datepicker) {
+    $('#datepicker1').datepicker();
+  }
 
   // 15. Time Picker
-  $('#timepicker').timepicker();
+  if ($.fn.timepicker) {
+    $('#timepicker').timepicker();
+  }
 
   //16. Overlay
-  $(".snake").snakeify({
-    speed: 200
-  });
+  if ($.fn.snakeify) {
+    $(".snake").snakeify({
+      speed: 200
+    });
+  }
 
 
   //17.  Progress barfiller
-
-  $('#bar1').barfiller();
-  $('#bar2').barfiller();
-  $('#bar3').barfiller();
-  $('#bar4').barfiller();
-  $('#bar5').barfiller();
-  $('#bar6').barfiller();
+  if ($.fn.barfiller) {
+    $('#bar1').barfiller();
+    $('#bar2').barfiller();
+    $('#bar3').barfiller();
+    $('#bar4').barfiller();
+    $('#bar5').barfiller();
+    $('#bar6').barfiller();
+  }
 
 })(jQuery);
 window.onload = function () {
@@ -240,7 +256,7 @@ window.onload = function () {
       submitButton.innerHTML = '...';
 
       const formData = new FormData(subscriberform);
-      csrf_token = subscriberform.getAttribute("csrf");
+      csrf_token = formData.get("csrfmiddlewaretoken");
       api_url = subscriberform.getAttribute("action");
 
       fetch(api_url, {
@@ -0,0 +1,93 @@
+// Public pages are cached, so forms are rendered with an empty CSRF field
+// (see the lazy_csrf_token template tag). The token is fetched the first time
+// the visitor focuses or submits one of those forms.
+(function () {
+  var tokenRequest = null;
+
+  function fetchCsrfToken(url) {
+    if (!tokenRequest) {
+      tokenRequest = fetch(url, { credentials: 'same-origin' })
+        .then(function (response) { return response.json(); })
+        .then(function (data) { return data.token; })
+        .catch(function (error) {
+          tokenRequest = null;
+          throw error;
+        });
+    }
+    return tokenRequest;
+  }
+
+  function fillCsrfField(field) {
+    return fetchCsrfToken(field.getAttribute('data-csrf-url')).then(function (token) {
+      field.value = token;
+      return token;
+    });
+  }
+
+  function lazyCsrfField(form) {
+    return form && form.querySelector ? form.querySelector('input[data-csrf-url]') : null;
+  }
+
+  document.addEventListener('focusin', function (event) {
+    var field = lazyCsrfField(event.target.form);
+    if (field && !field.value) {
+      fillCsrfField(field);
+    }
+  });
+
+  // Submitted without ever focusing a field: get the token, then submit again
+  document.addEventListener('submit', function (event) {
+    var form = event.target;
+    var field = lazyCsrfField(form);
+    if (field && !field.value) {
+      event.preventDefault();
+      event.stopImmediatePropagation();
+      fillCsrfField(field).then(function () {
+        if (form.requestSubmit) {
+          form.requestSubmit();
+        } else {
+          form.submit();
+        }
+      });
+    }
+  }, true);
+})();
+
+// Infinite scroll for the blog index: when the pagination comes into view,
+// load the next batch of articles (BlogIndex serves them as JSON).
+(function () {
+  var list = document.querySelector('.blog-article-list[data-next-url]');
+  if (!list || !('IntersectionObserver' in window)) {
+    return;
+  }
+  var pagination = list.parentNode.querySelector('.blog-pagination');
+  var loading = false;
+
+  var observer = new IntersectionObserver(function (entries) {
+    var nextUrl = list.getAttribute('data-next-url');
+    if (loading || !nextUrl || !entries[0].isIntersecting) {
+      return;
+    }
+    loading = true;
+    fetch(nextUrl, { credentials: 'same-origin' })
+      .then(function (response) { return response.json(); })
+      .then(function (data) {
+        list.insertAdjacentHTML('beforeend', data.html);
+        if (data.next_cursor) {
+          list.setAttribute('data-next-url', nextUrl.replace(/after=[^&]*/, 'after=' + data.next_cursor));
+        } else {
+          list.removeAttribute('data-next-url');
+          observer.disconnect();
+        }
+        // The links no longer match what is on screen
+        pagination.style.visibility = 'hidden';
+      })
+      .catch(function (error) {
+        console.error('Error:', error);
+      })
+      .finally(function () {
+        loading = false;
+      });
+  });
+  observer.observe(pagination);
+})();
@@ -8,7 +8,7 @@ from wagtail.documents import urls as wagtaildocs_urls
 
 from search import views as search_views
 from subscribeapi import views as subscriber
-from base.views import contact_form_submission
+from base.views import contact_form_submission, csrf_token
 from blog.views import send_test_email
 urlpatterns = [
     path("django-admin/", admin.site.urls),
@@ -16,7 +16,9 @@ urlpatterns = [
     path("documents/", include(wagtaildocs_urls)),
     path("search/", search_views.search, name="search"),
     path('api/subscribe/', subscriber.subscribe, name='api_subscribe'),
+    path('newsletter/unsubscribe/<str:token>/', subscriber.unsubscribe, name='newsletter_unsubscribe'),
     path('api/contact/', contact_form_submission, name='contact_form_submission'),
+    path('api/csrf/', csrf_token, name='csrf_token'),
     path('send-test-email/', send_test_email, name='send_test_email'),
 ]
 
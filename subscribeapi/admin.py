@@ -1,5 +1,7 @@
-from wagtail_modeladmin.options import ModelAdmin, modeladmin_register
-from .models import Subscriber  # Import your Subscriber model
+from django.db.models import Count, Q
+from wagtail_modeladmin.helpers import PermissionHelper
+from wagtail_modeladmin.options import ModelAdmin, ModelAdminGroup, modeladmin_register
+from .models import Campaign, CampaignRecipient, Subscriber  # Import your Subscriber model
 
 # Define a ModelAdmin class for Subscriber
 class SubscriberAdmin(ModelAdmin):
@@ -11,3 +13,54 @@ class SubscriberAdmin(ModelAdmin):
 
 # Register the ModelAdmin class with Wagtail
 modeladmin_register(SubscriberAdmin)
+
+
+class CampaignAdmin(ModelAdmin):
+    model = Campaign
+    menu_label = 'Campaigns'
+    menu_icon = 'mail'
+    list_display = ('subject', 'status', 'created_at', 'progress')
+    list_filter = ('status',)
+    search_fields = ('subject',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            recipient_count=Count('recipients'),
+            sent_count=Count('recipients', filter=Q(recipients__status=CampaignRecipient.STATUS_SENT)),
+            failed_count=Count('recipients', filter=Q(recipients__status=CampaignRecipient.STATUS_FAILED)),
+        )
+
+    def progress(self, obj):
+        # Campaigns are sent with `manage.py send_newsletter <id>`
+        if not obj.recipient_count:
+            return ''
+        return f"{obj.sent_count} of {obj.recipient_count} sent, {obj.failed_count} failed"
+
+
+class RecipientPermissionHelper(PermissionHelper):
+    # Recipients are added and updated by send_newsletter only
+    def user_can_create(self, user):
+        return False
+
+    def user_can_edit_obj(self, user, obj):
+        return False
+
+
+class CampaignRecipientAdmin(ModelAdmin):
+    model = CampaignRecipient
+    menu_label = 'Recipients'
+    menu_icon = 'user'
+    list_display = ('email', 'campaign', 'status', 'attempts', 'sent_at', 'error')
+    list_filter = ('campaign', 'status')
+    search_fields = ('email',)
+    list_select_related = ('campaign',)
+    permission_helper_class = RecipientPermissionHelper
+
+
+class NewsletterAdminGroup(ModelAdminGroup):
+    menu_label = 'Newsletters'
+    menu_icon = 'mail'
+    items = (CampaignAdmin, CampaignRecipientAdmin)
+
+
+modeladmin_register(NewsletterAdminGroup)
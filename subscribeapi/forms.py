@@ -0,0 +1,10 @@
+from django import forms
+
+
+class SubscriberImportForm(forms.Form):
+    file = forms.FileField(
+        label="CSV file",
+        help_text='One email per line, or an "email" column named in the first line. '
+                  'Emails already subscribed are skipped.',
+        widget=forms.ClearableFileInput(attrs={'accept': '.csv,text/csv'}),
+    )
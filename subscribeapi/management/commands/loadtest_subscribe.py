@@ -0,0 +1,96 @@
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from subscribeapi.models import Subscriber
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the subscribe endpoint: bursts of concurrent sign-ups with the same emails "
+        "in different cases, checking that each email is added exactly once and no request "
+        "fails. The test subscribers are deleted afterwards. It writes to the configured "
+        "database, so it only runs with DEBUG on; the test suite covers the same cases."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads", type=int, default=20,
+            help="Requests sent at the same moment in each burst (default: 20).",
+        )
+        parser.add_argument("--bursts", type=int, default=10, help="Number of bursts (default: 10).")
+        parser.add_argument(
+            "--emails", type=int, default=3,
+            help="Distinct emails signed up in each burst (default: 3).",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG:
+            raise CommandError("loadtest_subscribe writes to the database, it only runs with DEBUG on.")
+        threads = options["threads"]
+        run_id = uuid.uuid4().hex[:8]
+        url = reverse("api_subscribe")
+        barrier = threading.Barrier(threads)
+        emails = []
+        statuses = Counter()
+        timings = []
+
+        def sign_up(email):
+            client = Client()
+            try:
+                barrier.wait()
+                start = time.perf_counter()
+                response = client.post(url, {"email": email})
+                return response.status_code, time.perf_counter() - start
+            finally:
+                connections.close_all()
+
+        try:
+            # The requests go through the test client, whatever hosts the site is served on
+            with override_settings(ALLOWED_HOSTS=["testserver"]), ThreadPoolExecutor(max_workers=threads) as executor:
+                for burst in range(options["bursts"]):
+                    burst_emails = [f"loadtest-{run_id}-{burst}-{i}@example.com" for i in range(options["emails"])]
+                    emails += burst_emails
+                    # Every thread signs up one of the burst's emails, in a random case
+                    variants = [
+                        "".join(c.upper() if random.random() < 0.5 else c for c in burst_emails[i % len(burst_emails)])
+                        for i in range(threads)
+                    ]
+                    for status_code, duration in executor.map(sign_up, variants):
+                        statuses[status_code] += 1
+                        timings.append(duration)
+
+            stored = Counter(
+                email.lower() for email in
+                Subscriber.objects.filter(email__startswith=f"loadtest-{run_id}-").values_list("email", flat=True)
+            )
+        finally:
+            Subscriber.objects.filter(email__startswith=f"loadtest-{run_id}-").delete()
+
+        timings.sort()
+        percentile = lambda p: timings[min(len(timings) - 1, int(len(timings) * p / 100))] * 1000
+        self.stdout.write(
+            f"{len(timings)} requests: "
+            + ", ".join(f"{count} x {status_code}" for status_code, count in sorted(statuses.items()))
+        )
+        self.stdout.write(f"Latency: p50 {percentile(50):.1f} ms, p95 {percentile(95):.1f} ms, p99 {percentile(99):.1f} ms")
+
+        problems = []
+        if set(statuses) - {200, 201}:
+            problems.append("some requests failed")
+        if statuses[201] != len(emails):
+            problems.append(f"{statuses[201]} created responses for {len(emails)} emails")
+        if set(stored) != set(emails) or any(count > 1 for count in stored.values()):
+            problems.append(f"{sum(stored.values())} subscribers stored for {len(emails)} emails")
+        if problems:
+            raise CommandError("; ".join(problems))
+        self.stdout.write(self.style.SUCCESS("Every email was subscribed exactly once."))
@@ -0,0 +1,61 @@
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from subscribeapi import newsletter
+from subscribeapi.models import Campaign
+
+
+class Command(BaseCommand):
+    help = (
+        "Send a newsletter campaign to the subscribers. Progress is saved as it goes, so an "
+        "interrupted run is resumed by running the command again, which also retries the "
+        "recipients that failed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("campaign_id", type=int)
+        parser.add_argument(
+            "--connections", type=int, default=newsletter.CONNECTIONS,
+            help=f"Mail server connections sending in parallel (default: {newsletter.CONNECTIONS}).",
+        )
+        parser.add_argument(
+            "--rate", type=float, default=newsletter.RATE,
+            help=f"Maximum emails per second, 0 for no limit (default: {newsletter.RATE}).",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=newsletter.CHUNK_SIZE,
+            help=f"Recipients loaded and saved at a time (default: {newsletter.CHUNK_SIZE}).",
+        )
+        parser.add_argument(
+            "--dry-run", nargs="?", const="", metavar="DIRECTORY",
+            help="Write the emails to files in DIRECTORY (a new temporary one by default) "
+                 "instead of sending them, without saving anything.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            campaign = Campaign.objects.get(pk=options["campaign_id"])
+        except Campaign.DoesNotExist:
+            raise CommandError(f"No campaign with id {options['campaign_id']}")
+
+        dry_run_path = options["dry_run"]
+        if dry_run_path is not None:
+            dry_run_path = dry_run_path or tempfile.mkdtemp(prefix="newsletter-")
+            self.stdout.write(f"Dry run, writing the emails to {dry_run_path}")
+        elif campaign.status == Campaign.STATUS_SENT:
+            raise CommandError(f"{campaign} has already been sent")
+
+        def progress(sent, failed):
+            self.stdout.write(f"{sent} sent, {failed} failed")
+
+        sent, failed = newsletter.send(
+            campaign,
+            connections=options["connections"],
+            rate=options["rate"],
+            chunk_size=options["chunk_size"],
+            dry_run_path=dry_run_path or None,
+            progress=progress,
+        )
+        style = self.style.ERROR if failed else self.style.SUCCESS
+        self.stdout.write(style(f"{campaign}: {sent} sent, {failed} failed."))
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.1 on 2026-10-16 21:14
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def normalize_emails(apps, schema_editor):
+    # Keep the first subscription of emails that differ only by case
+    Subscriber = apps.get_model('subscribeapi', 'Subscriber')
+    seen, duplicates, renamed = set(), [], {}
+    for pk, email in Subscriber.objects.order_by('pk').values_list('pk', 'email'):
+        normalized = email.strip().lower()
+        if normalized in seen:
+            duplicates.append(pk)
+            continue
+        seen.add(normalized)
+        if normalized != email:
+            renamed[pk] = normalized
+    Subscriber.objects.filter(pk__in=duplicates).delete()
+    for pk, email in renamed.items():
+        Subscriber.objects.filter(pk=pk).update(email=email)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscribeapi', '0002_campaign'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_emails, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='subscriber',
+            name='email',
+            field=models.EmailField(max_length=254),
+        ),
+        migrations.AddConstraint(
+            model_name='subscriber',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='subscriber_email_ci_unique'),
+        ),
+    ]
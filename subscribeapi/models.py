@@ -1,7 +1,14 @@
-from django.db import models
+from datetime import timedelta
+
+from django import forms
+from django.db import connection, models, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from wagtail.admin.panels import FieldPanel
 
 class Subscriber(models.Model):
-    email = models.EmailField(unique=True)
+    # Stored normalized (see normalize_email), unique whatever the case
+    email = models.EmailField()
     subscribed_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -9,4 +16,138 @@ class Subscriber(models.Model):
 
     class Meta:
         verbose_name = "Subscriber"
-        verbose_name_plural = "Subscribers"
\ No newline at end of file
+        verbose_name_plural = "Subscribers"
+        constraints = [
+            models.UniqueConstraint(Lower('email'), name='subscriber_email_ci_unique'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.email = Subscriber.normalize_email(self.email)
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def normalize_email(email):
+        return email.strip().lower()
+
+    @staticmethod
+    def subscribe(email):
+        """
+        Add a subscriber unless the email is already subscribed, in a single
+        INSERT ... ON CONFLICT DO NOTHING, so concurrent sign-ups with the same
+        email can't both insert it (or fail). Returns whether it was added.
+        """
+        return Subscriber.subscribe_many([email]) == 1
+
+    @staticmethod
+    def unsubscribe(email):
+        """
+        Remove the subscriber, and from the recipients of campaigns that are
+        still being sent to. Returns whether the email was subscribed.
+        """
+        email = Subscriber.normalize_email(email)
+        with transaction.atomic():
+            deleted, _ = Subscriber.objects.filter(email=email).delete()
+            CampaignRecipient.objects.filter(
+                email=email, status__in=[CampaignRecipient.STATUS_PENDING, CampaignRecipient.STATUS_FAILED]
+            ).delete()
+        return bool(deleted)
+
+    @staticmethod
+    def subscribe_many(emails):
+        """
+        Add the emails that aren't subscribed yet in one statement (keep it to
+        a few thousand at a time), returns how many were added.
+        """
+        if not emails:
+            return 0
+        table = connection.ops.quote_name(Subscriber._meta.db_table)
+        email_column = connection.ops.quote_name(Subscriber._meta.get_field('email').column)
+        subscribed_at_column = connection.ops.quote_name(Subscriber._meta.get_field('subscribed_at').column)
+        now = timezone.now()
+        params = []
+        for email in emails:
+            params += [Subscriber.normalize_email(email), now]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} ({email_column}, {subscribed_at_column}) "
+                f"VALUES {', '.join(['(%s, %s)'] * len(emails))} "
+                f"ON CONFLICT DO NOTHING RETURNING 1",
+                params,
+            )
+            return len(cursor.fetchall())
+
+class Campaign(models.Model):
+    """
+    A newsletter: a digest of blog articles mailed to every subscriber by the
+    send_newsletter command (see subscribeapi/newsletter.py).
+    """
+    STATUS_DRAFT = 'draft'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_CHOICES = [
+        (STATUS_DRAFT, 'Draft'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    intro = models.TextField(blank=True, help_text="Shown above the articles")
+    articles = models.ManyToManyField('blog.BlogAndNewsArticle', related_name='+')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_DRAFT, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True, editable=False)
+    finished_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Rendered once when sending starts, so every recipient (and a resumed run) gets the same email
+    text_body = models.TextField(blank=True, editable=False)
+    html_body = models.TextField(blank=True, editable=False)
+
+    panels = [
+        FieldPanel('subject'),
+        FieldPanel('intro'),
+        FieldPanel('articles', widget=forms.CheckboxSelectMultiple),
+    ]
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.subject
+
+
+class CampaignRecipient(models.Model):
+    """Delivery status of a campaign for one subscriber."""
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='recipients')
+    email = models.EmailField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When a send_newsletter run took the recipient to send to (status "sending")
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    # Recipients that failed this many times are skipped by later runs
+    MAX_ATTEMPTS = 3
+    # Recipients still "sending" this long after being claimed belong to a run that crashed
+    CLAIM_TIMEOUT = timedelta(minutes=30)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['campaign', 'email'], name='unique_campaign_recipient'),
+        ]
+        indexes = [
+            models.Index(fields=['campaign', 'status'], name='campaign_recipient_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.campaign} to {self.email}"
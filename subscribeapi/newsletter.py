@@ -0,0 +1,298 @@
+"""
+Newsletter delivery: a Campaign is rendered once, its recipients are taken
+from the subscribers when sending starts, then sent in chunks through a
+few SMTP connections that are kept open for the whole run.
+
+Each chunk of recipients is claimed by the run sending it (status
+"sending"), so runs started at the same time never send to the same
+recipient, and every recipient's status is saved as soon as their email
+went out. An interrupted run is resumed by running send_newsletter again;
+recipients that failed are retried by later runs, up to
+CampaignRecipient.MAX_ATTEMPTS times.
+
+Every email links to the unsubscribe view with a signed token of the
+recipient's address, also given in the List-Unsubscribe headers.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core import signing
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from wagtail.models import Site
+
+from .models import Campaign, CampaignRecipient, Subscriber
+
+# Defaults of the send_newsletter options
+CHUNK_SIZE = getattr(settings, 'NEWSLETTER_CHUNK_SIZE', 200)
+CONNECTIONS = getattr(settings, 'NEWSLETTER_CONNECTIONS', 2)
+# Emails per second over all connections, 0 for no limit
+RATE = getattr(settings, 'NEWSLETTER_RATE', 5)
+
+
+UNSUBSCRIBE_SALT = 'subscribeapi.unsubscribe'
+# Stands for each recipient's own unsubscribe link in the rendered bodies
+UNSUBSCRIBE_URL_PLACEHOLDER = '%%unsubscribe_url%%'
+
+
+def make_unsubscribe_token(email):
+    return signing.dumps(email, salt=UNSUBSCRIBE_SALT)
+
+
+def read_unsubscribe_token(token):
+    """The email address of an unsubscribe token, or None if it isn't valid."""
+    try:
+        return signing.loads(token, salt=UNSUBSCRIBE_SALT)
+    except signing.BadSignature:
+        return None
+
+
+def get_root_url():
+    """The site's address, the unsubscribe links start with it."""
+    site = Site.objects.filter(is_default_site=True).first()
+    return site.root_url if site else settings.WAGTAILADMIN_BASE_URL
+
+
+def get_unsubscribe_url(email, root_url):
+    return root_url + reverse('newsletter_unsubscribe', args=[make_unsubscribe_token(email)])
+
+
+def render(campaign):
+    """Return the text and HTML bodies of the campaign."""
+    context = {
+        'campaign': campaign,
+        'articles': campaign.articles.live().order_by('-date', '-pk'),
+        'unsubscribe_url': UNSUBSCRIBE_URL_PLACEHOLDER,
+    }
+    return (
+        render_to_string('subscribeapi/newsletter.txt', context),
+        render_to_string('subscribeapi/newsletter.html', context),
+    )
+
+
+def prepare(campaign, chunk_size=CHUNK_SIZE):
+    """
+    Render a draft campaign and add every current subscriber as a recipient.
+    Only one of several runs started at the same time does it, the others
+    wait for it and reload the campaign.
+    """
+    if campaign.status != Campaign.STATUS_DRAFT:
+        return
+    text_body, html_body = render(campaign)
+    with transaction.atomic():
+        started = Campaign.objects.filter(pk=campaign.pk, status=Campaign.STATUS_DRAFT).update(
+            status=Campaign.STATUS_SENDING,
+            started_at=timezone.now(),
+            text_body=text_body,
+            html_body=html_body,
+        )
+        if not started:
+            campaign.refresh_from_db()
+            return
+        campaign.refresh_from_db()
+        emails = Subscriber.objects.order_by('pk').values_list('email', flat=True).iterator(chunk_size=chunk_size)
+        recipients = []
+        for email in emails:
+            recipients.append(CampaignRecipient(campaign=campaign, email=email))
+            if len(recipients) == chunk_size:
+                CampaignRecipient.objects.bulk_create(recipients, ignore_conflicts=True)
+                recipients = []
+        CampaignRecipient.objects.bulk_create(recipients, ignore_conflicts=True)
+
+
+def claim_chunk(campaign, chunk_size, after_pk=0):
+    """
+    Take the next recipients still to send to (past ``after_pk``) for this
+    run: they are marked as "sending", so other runs skip them, and counted
+    as an attempt.
+    """
+    stale = timezone.now() - CampaignRecipient.CLAIM_TIMEOUT
+    with transaction.atomic():
+        chunk = list(
+            campaign.recipients.filter(
+                Q(status__in=[CampaignRecipient.STATUS_PENDING, CampaignRecipient.STATUS_FAILED])
+                | Q(status=CampaignRecipient.STATUS_SENDING, claimed_at__lt=stale),
+                attempts__lt=CampaignRecipient.MAX_ATTEMPTS,
+                pk__gt=after_pk,
+            ).order_by('pk').select_for_update(skip_locked=True)[:chunk_size]
+        )
+        now = timezone.now()
+        for recipient in chunk:
+            recipient.status = CampaignRecipient.STATUS_SENDING
+            recipient.claimed_at = now
+            recipient.attempts += 1
+        CampaignRecipient.objects.bulk_update(chunk, ['status', 'claimed_at', 'attempts'])
+    return chunk
+
+
+def recipient_chunks(campaign, chunk_size):
+    """The recipients still to send to, claimed a chunk at a time."""
+    last_pk = 0
+    while chunk := claim_chunk(campaign, chunk_size, last_pk):
+        yield chunk
+        last_pk = chunk[-1].pk
+
+
+def release(recipients):
+    """Give back recipients claimed by a run that stopped before sending to them."""
+    CampaignRecipient.objects.filter(
+        pk__in=[recipient.pk for recipient in recipients], status=CampaignRecipient.STATUS_SENDING
+    ).update(status=CampaignRecipient.STATUS_PENDING, attempts=F('attempts') - 1)
+
+
+def has_remaining(campaign):
+    """Whether recipients are left to send to, or are being sent to by another run."""
+    stale = timezone.now() - CampaignRecipient.CLAIM_TIMEOUT
+    return campaign.recipients.filter(
+        Q(
+            status__in=[
+                CampaignRecipient.STATUS_PENDING, CampaignRecipient.STATUS_FAILED, CampaignRecipient.STATUS_SENDING
+            ],
+            attempts__lt=CampaignRecipient.MAX_ATTEMPTS,
+        )
+        | Q(status=CampaignRecipient.STATUS_SENDING, claimed_at__gte=stale)
+    ).exists()
+
+
+def subscriber_chunks(campaign, chunk_size):
+    """Unsaved recipients for every subscriber, a chunk at a time (for dry runs)."""
+    last_pk = 0
+    while True:
+        subscribers = list(Subscriber.objects.filter(pk__gt=last_pk).order_by('pk')[:chunk_size])
+        if not subscribers:
+            return
+        yield [CampaignRecipient(campaign=campaign, email=subscriber.email) for subscriber in subscribers]
+        last_pk = subscribers[-1].pk
+
+
+class Throttle:
+    """Spaces out calls to wait() from any number of threads to ``rate`` per second."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_time = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ConnectionPool:
+    """One email backend connection per sending thread, opened once and reused."""
+
+    def __init__(self, backend=None, **kwargs):
+        self.backend = backend
+        self.kwargs = kwargs
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def send(self, message):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = get_connection(self.backend, **self.kwargs)
+            connection.open()
+            self.local.connection = connection
+            with self.lock:
+                self.connections.append(connection)
+        try:
+            connection.send_messages([message])
+        except Exception:
+            # Possibly broken, the thread's next email opens a new one
+            connection.close()
+            self.local.connection = None
+            raise
+
+    def close(self):
+        for connection in self.connections:
+            connection.close()
+
+
+def build_message(campaign, email, root_url):
+    unsubscribe_url = get_unsubscribe_url(email, root_url)
+    message = EmailMultiAlternatives(
+        subject=campaign.subject,
+        body=campaign.text_body.replace(UNSUBSCRIBE_URL_PLACEHOLDER, unsubscribe_url),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email],
+        headers={
+            # One-click unsubscribe from the mail client (RFC 8058)
+            'List-Unsubscribe': f'<{unsubscribe_url}>',
+            'List-Unsubscribe-Post': 'List-Unsubscribe=One-Click',
+        },
+    )
+    message.attach_alternative(campaign.html_body.replace(UNSUBSCRIBE_URL_PLACEHOLDER, unsubscribe_url), 'text/html')
+    return message
+
+
+def send(campaign, connections=CONNECTIONS, rate=RATE, chunk_size=CHUNK_SIZE, dry_run_path=None, progress=None):
+    """
+    Send the campaign to its remaining recipients. With ``dry_run_path`` the
+    emails are written to files in that directory instead, for every
+    subscriber, and nothing is saved. ``progress(sent, failed)`` is called
+    after each chunk.
+    """
+    if dry_run_path:
+        campaign.text_body, campaign.html_body = render(campaign)
+        chunks = subscriber_chunks(campaign, chunk_size)
+        pool = ConnectionPool('django.core.mail.backends.filebased.EmailBackend', file_path=dry_run_path)
+    else:
+        prepare(campaign, chunk_size)
+        chunks = recipient_chunks(campaign, chunk_size)
+        pool = ConnectionPool()
+    throttle = Throttle(rate)
+    # Looked up here, the sending threads don't use the database
+    root_url = get_root_url()
+
+    def send_to(recipient):
+        throttle.wait()
+        try:
+            pool.send(build_message(campaign, recipient.email, root_url))
+        except Exception as e:
+            return e
+        return None
+
+    sent = failed = 0
+    chunk = []
+    executor = ThreadPoolExecutor(max_workers=connections)
+    try:
+        for chunk in chunks:
+            # Saved one at a time as the emails go out, so if the run stops only
+            # the ones being sent at that moment can go out twice
+            for recipient, error in zip(chunk, executor.map(send_to, chunk)):
+                if error is None:
+                    recipient.status, recipient.sent_at, recipient.error = CampaignRecipient.STATUS_SENT, timezone.now(), ''
+                    sent += 1
+                else:
+                    recipient.status, recipient.error = CampaignRecipient.STATUS_FAILED, str(error)
+                    failed += 1
+                if not dry_run_path:
+                    recipient.save(update_fields=['status', 'sent_at', 'error'])
+            if progress:
+                progress(sent, failed)
+    finally:
+        # Emails not started yet are left to the next run
+        executor.shutdown(cancel_futures=True)
+        if not dry_run_path:
+            release([recipient for recipient in chunk if recipient.status == CampaignRecipient.STATUS_SENDING])
+        pool.close()
+
+    if not dry_run_path and not has_remaining(campaign):
+        Campaign.objects.filter(pk=campaign.pk, status=Campaign.STATUS_SENDING).update(
+            status=Campaign.STATUS_SENT, finished_at=timezone.now()
+        )
+        campaign.refresh_from_db()
+    return sent, failed
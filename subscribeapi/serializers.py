@@ -4,4 +4,7 @@ from .models import Subscriber
 class SubscriberSerializer(serializers.ModelSerializer):
     class Meta:
         model = Subscriber
-        fields = ['email']
\ No newline at end of file
+        fields = ['email']
+
+    def validate_email(self, value):
+        return Subscriber.normalize_email(value)
\ No newline at end of file
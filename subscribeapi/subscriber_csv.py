@@ -0,0 +1,101 @@
+"""
+CSV export and import of the subscribers, both a chunk at a time so that
+lists of hundreds of thousands of addresses take constant memory.
+"""
+import csv
+import io
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+
+from .models import Subscriber
+
+HEADER = ['email', 'subscribed_at']
+# Rows fetched from the (server-side) cursor at a time when exporting
+EXPORT_CHUNK_SIZE = 2000
+# Emails inserted per statement when importing
+IMPORT_BATCH_SIZE = 1000
+# Invalid lines listed in the import report, the rest are only counted
+MAX_REPORTED_ERRORS = 20
+
+
+class Echo:
+    """A file-like object whose write() returns the line, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows():
+    """The subscribers as CSV, oldest first, a chunk of lines at a time."""
+    writer = csv.writer(Echo())
+    subscribers = Subscriber.objects.order_by('pk').values_list('email', 'subscribed_at')
+    lines = [writer.writerow(HEADER)]
+    for email, subscribed_at in subscribers.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        lines.append(writer.writerow([email, subscribed_at.isoformat()]))
+        # One write to the client per chunk fetched rather than per line
+        if len(lines) >= EXPORT_CHUNK_SIZE:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+class ImportResult:
+    def __init__(self):
+        self.added = 0
+        self.existing = 0
+        self.invalid = 0
+        self.errors = []
+
+    def add_error(self, line_number, message):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"Line {line_number}: {message}")
+
+
+def read_emails(csv_file, result):
+    """
+    The normalized emails of a CSV file, from its "email" column if it has a
+    header row naming one, otherwise from its first column.
+    """
+    reader = csv.reader(csv_file)
+    column = 0
+    for row in reader:
+        if not row or not any(value.strip() for value in row):
+            continue
+        values = [value.strip().lower() for value in row]
+        if reader.line_num == 1 and 'email' in values:
+            column = values.index('email')
+            continue
+        if column >= len(row):
+            result.add_error(reader.line_num, "no email")
+            continue
+        email = Subscriber.normalize_email(row[column])
+        try:
+            validate_email(email)
+        except ValidationError:
+            result.add_error(reader.line_num, f"{row[column]!r} is not a valid email")
+            continue
+        yield email
+
+
+def import_csv(uploaded_file, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Subscribe the emails of an uploaded CSV file, skipping the ones already
+    subscribed. Returns an ImportResult.
+    """
+    result = ImportResult()
+    csv_file = io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', errors='replace', newline='')
+    emails = read_emails(csv_file, result)
+    while True:
+        batch = list(islice(emails, batch_size))
+        if not batch:
+            break
+        # Repeated emails count as already subscribed
+        added = Subscriber.subscribe_many(list(dict.fromkeys(batch)))
+        result.added += added
+        result.existing += len(batch) - added
+    csv_file.detach()
+    return result
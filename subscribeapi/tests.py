@@ -1,3 +1,381 @@
-from django.test import TestCase
+import csv
+import io
+import threading
+from unittest import mock
+from urllib.parse import urlsplit
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections
+from django.conf import settings
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from . import newsletter, subscriber_csv
+from .models import Campaign, CampaignRecipient, Subscriber
+
+# Admin pages link static files that only have manifest entries after collectstatic
+NO_MANIFEST_STORAGES = {
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+class SubscribeTests(TestCase):
+    url = reverse('api_subscribe')
+
+    def test_new_email_is_created(self):
+        response = self.client.post(self.url, {'email': ' Someone@Example.com '})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(Subscriber.objects.values_list('email', flat=True)), ['someone@example.com'])
+
+    def test_same_email_in_another_case_is_already_subscribed(self):
+        self.client.post(self.url, {'email': 'someone@example.com'})
+
+        response = self.client.post(self.url, {'email': 'SomeOne@EXAMPLE.com'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['detail'], "This email is already subscribed.")
+        self.assertEqual(Subscriber.objects.count(), 1)
+
+    def test_invalid_email_is_rejected(self):
+        response = self.client.post(self.url, {'email': 'not an email'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Subscriber.objects.exists())
+
+
+class ConcurrentSubscribeTests(TransactionTestCase):
+    """Sign-ups sent at the same moment, each from its own thread and database connection."""
+    url = reverse('api_subscribe')
+    threads = 8
+
+    def sign_up_at_once(self, emails):
+        barrier = threading.Barrier(len(emails))
+        statuses = [None] * len(emails)
+
+        def sign_up(index):
+            try:
+                barrier.wait()
+                statuses[index] = Client().post(self.url, {'email': emails[index]}).status_code
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=sign_up, args=[index]) for index in range(len(emails))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return statuses
+
+    def test_same_email_is_created_once(self):
+        statuses = self.sign_up_at_once(['someone@example.com'] * self.threads)
+
+        self.assertEqual(sorted(statuses), [200] * (self.threads - 1) + [201])
+        self.assertEqual(Subscriber.objects.count(), 1)
+
+    def test_case_variants_conflict(self):
+        variants = ['someone@example.com', 'SOMEONE@example.com', 'Someone@Example.com', 'someone@EXAMPLE.COM']
+        statuses = self.sign_up_at_once(variants * 2)
+
+        self.assertEqual(sorted(statuses), [200] * (len(variants) * 2 - 1) + [201])
+        self.assertEqual(list(Subscriber.objects.values_list('email', flat=True)), ['someone@example.com'])
+
+    def test_different_emails_are_all_created(self):
+        emails = [f'someone{index}@example.com' for index in range(self.threads)]
+
+        statuses = self.sign_up_at_once(emails)
+
+        self.assertEqual(statuses, [201] * self.threads)
+        self.assertEqual(Subscriber.objects.count(), self.threads)
+
+
+class SubscriberExportTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+
+    def export(self):
+        response = self.client.get(reverse('subscribers_export'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        chunks = [chunk.decode() for chunk in response.streaming_content]
+        return chunks, list(csv.reader(io.StringIO(''.join(chunks))))
+
+    def test_exports_every_subscriber_oldest_first(self):
+        Subscriber.subscribe_many(['b@example.com', 'a@example.com'])
+
+        chunks, rows = self.export()
+
+        self.assertEqual(rows[0], subscriber_csv.HEADER)
+        self.assertEqual([row[0] for row in rows[1:]], ['b@example.com', 'a@example.com'])
+
+    def test_streams_a_chunk_at_a_time(self):
+        Subscriber.subscribe_many([f'someone{index}@example.com' for index in range(5)])
+
+        with mock.patch.object(subscriber_csv, 'EXPORT_CHUNK_SIZE', 2):
+            chunks, rows = self.export()
+
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(len(chunks), 3)
+
+    def test_requires_permission(self):
+        self.client.logout()
+
+        response = self.client.get(reverse('subscribers_export'))
+
+        self.assertEqual(response.status_code, 302)
+
+
+class SubscriberImportTests(TestCase):
+    def import_csv(self, content, **kwargs):
+        return subscriber_csv.import_csv(SimpleUploadedFile('subscribers.csv', content.encode('utf-8')), **kwargs)
+
+    def emails(self):
+        return sorted(Subscriber.objects.values_list('email', flat=True))
+
+    def test_without_header_reads_the_first_column(self):
+        result = self.import_csv('a@example.com,Ann\nB@Example.com,Bob\n')
+
+        self.assertEqual((result.added, result.existing, result.invalid), (2, 0, 0))
+        self.assertEqual(self.emails(), ['a@example.com', 'b@example.com'])
+
+    def test_header_names_the_email_column(self):
+        result = self.import_csv('Name,E-mail notes,Email\nAnn,x,a@example.com\nBob,y,b@example.com\n')
+
+        self.assertEqual(result.added, 2)
+        self.assertEqual(self.emails(), ['a@example.com', 'b@example.com'])
+
+    def test_invalid_lines_are_reported_and_skipped(self):
+        result = self.import_csv('email,name\nnot an email,Ann\n\n,\nb@example.com,Bob\n')
+
+        self.assertEqual((result.added, result.invalid), (1, 1))
+        self.assertEqual(result.errors, ["Line 2: 'not an email' is not a valid email"])
+        self.assertEqual(self.emails(), ['b@example.com'])
+
+    def test_missing_column_is_reported(self):
+        result = self.import_csv('name,email\nAnn\n')
+
+        self.assertEqual(result.errors, ["Line 2: no email"])
+
+    def test_duplicates_and_existing_emails_are_counted_as_existing(self):
+        Subscriber.subscribe('a@example.com')
+
+        result = self.import_csv('a@example.com\nb@example.com\nB@example.com\nb@example.com\n', batch_size=2)
+
+        self.assertEqual((result.added, result.existing), (1, 3))
+        self.assertEqual(self.emails(), ['a@example.com', 'b@example.com'])
+
+    def test_byte_order_mark_is_ignored(self):
+        result = self.import_csv('\ufeffemail\na@example.com\n')
+
+        self.assertEqual((result.added, result.invalid), (1, 0))
+        self.assertEqual(self.emails(), ['a@example.com'])
+
+    @override_settings(STORAGES=NO_MANIFEST_STORAGES)
+    def test_import_view_reports_the_result(self):
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        upload = SimpleUploadedFile('subscribers.csv', b'a@example.com\nnope\n')
+
+        response = self.client.post(reverse('subscribers_import'), {'file': upload}, follow=True)
+
+        self.assertContains(response, "1 subscribers added, 0 already subscribed, 1 invalid lines skipped.")
+        self.assertContains(response, "Line 2: &#x27;nope&#x27; is not a valid email")
+
+
+class Interrupted(BaseException):
+    """Stops a send like a KeyboardInterrupt would."""
+
+
+class CampaignTests(TestCase):
+    emails = ['a@example.com', 'b@example.com', 'c@example.com']
+
+    def setUp(self):
+        Subscriber.subscribe_many(self.emails)
+        self.campaign = Campaign.objects.create(subject="News")
+
+    def send(self, **kwargs):
+        return newsletter.send(self.campaign, rate=0, **{'chunk_size': 2, **kwargs})
+
+    def recipient_statuses(self):
+        return dict(self.campaign.recipients.values_list('email', 'status'))
+
+    def test_sends_once_to_every_subscriber(self):
+        self.assertEqual(self.send(), (3, 0))
+
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), self.emails)
+        self.assertEqual(set(self.recipient_statuses().values()), {CampaignRecipient.STATUS_SENT})
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, Campaign.STATUS_SENT)
+        self.assertIsNotNone(self.campaign.finished_at)
+
+    def test_second_send_sends_nothing(self):
+        self.send()
+
+        self.assertEqual(self.send(), (0, 0))
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_site_address_is_looked_up_once(self):
+        with mock.patch.object(newsletter, 'get_root_url', return_value='https://example.org') as get_root_url:
+            self.send()
+
+        get_root_url.assert_called_once_with()
+        for message in mail.outbox:
+            self.assertTrue(message.extra_headers['List-Unsubscribe'].startswith('<https://example.org/'))
+
+    def test_failed_recipients_are_retried(self):
+        with mock.patch.object(newsletter.ConnectionPool, 'send', side_effect=OSError("Connection refused")):
+            self.assertEqual(self.send(), (0, 3))
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, Campaign.STATUS_SENDING)
+
+        self.assertEqual(self.send(), (3, 0))
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_recipients_not_sent_to_are_released_when_the_send_stops(self):
+        send = newsletter.ConnectionPool.send
+        calls = []
+
+        def send_first_only(pool, message):
+            calls.append(message)
+            if len(calls) > 1:
+                raise Interrupted
+            send(pool, message)
+
+        with mock.patch.object(newsletter.ConnectionPool, 'send', send_first_only):
+            with self.assertRaises(Interrupted):
+                self.send(connections=1, chunk_size=3)
+
+        self.assertEqual(sorted(self.recipient_statuses().values()), [
+            CampaignRecipient.STATUS_PENDING, CampaignRecipient.STATUS_PENDING, CampaignRecipient.STATUS_SENT,
+        ])
+        self.assertEqual(
+            list(self.campaign.recipients.filter(status=CampaignRecipient.STATUS_PENDING).values_list('attempts', flat=True)),
+            [0, 0],
+        )
+
+        self.assertEqual(self.send(), (2, 0))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), self.emails)
+
+    def test_recipients_claimed_by_a_crashed_run_are_sent_to(self):
+        newsletter.prepare(self.campaign)
+        self.campaign.recipients.filter(email='a@example.com').update(
+            status=CampaignRecipient.STATUS_SENDING, attempts=1,
+            claimed_at=timezone.now() - CampaignRecipient.CLAIM_TIMEOUT * 2,
+        )
+
+        self.assertEqual(self.send(), (3, 0))
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, Campaign.STATUS_SENT)
+
+    def test_recipients_claimed_by_another_run_are_left_to_it(self):
+        newsletter.prepare(self.campaign)
+        self.campaign.recipients.filter(email='a@example.com').update(
+            status=CampaignRecipient.STATUS_SENDING, attempts=1, claimed_at=timezone.now(),
+        )
+
+        self.assertEqual(self.send(), (2, 0))
+        self.assertNotIn('a@example.com', [message.to[0] for message in mail.outbox])
+        # Sent by the other run when it's done
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, Campaign.STATUS_SENDING)
+
+    def test_subscribers_added_after_sending_started_are_not_sent_to(self):
+        newsletter.prepare(self.campaign)
+        Subscriber.subscribe('late@example.com')
+
+        self.send()
+
+        self.assertEqual(len(mail.outbox), 3)
+
+
+class ConcurrentCampaignTests(TransactionTestCase):
+    """send_newsletter started several times at once, each run with its own database connection."""
+    runs = 4
+
+    def test_every_subscriber_is_sent_to_once(self):
+        emails = [f'someone{index}@example.com' for index in range(40)]
+        Subscriber.subscribe_many(emails)
+        campaign = Campaign.objects.create(subject="News")
+        barrier = threading.Barrier(self.runs)
+        results = [None] * self.runs
+
+        def run(index):
+            try:
+                barrier.wait()
+                results[index] = newsletter.send(Campaign.objects.get(pk=campaign.pk), rate=0, chunk_size=3)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=run, args=[index]) for index in range(self.runs)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sum(sent for sent, failed in results), len(emails))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), sorted(emails))
+        campaign.refresh_from_db()
+        self.assertEqual(campaign.status, Campaign.STATUS_SENT)
+
+
+@override_settings(STORAGES=NO_MANIFEST_STORAGES)
+class UnsubscribeTests(TestCase):
+    def setUp(self):
+        Subscriber.subscribe('someone@example.com')
+        self.url = reverse('newsletter_unsubscribe', args=[newsletter.make_unsubscribe_token('someone@example.com')])
+
+    def test_newsletter_links_to_the_recipient_unsubscribe_url(self):
+        campaign = Campaign.objects.create(subject="News")
+        newsletter.send(campaign, rate=0)
+
+        message = mail.outbox[0]
+        unsubscribe_url = message.extra_headers['List-Unsubscribe'].strip('<>')
+        match = resolve(urlsplit(unsubscribe_url).path)
+        self.assertEqual(match.url_name, 'newsletter_unsubscribe')
+        self.assertEqual(newsletter.read_unsubscribe_token(match.kwargs['token']), 'someone@example.com')
+        self.assertEqual(message.extra_headers['List-Unsubscribe-Post'], 'List-Unsubscribe=One-Click')
+        self.assertIn(unsubscribe_url, message.body)
+        self.assertIn(unsubscribe_url, message.alternatives[0][0])
+
+    def test_opening_the_link_does_not_unsubscribe(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'someone@example.com')
+        self.assertTrue(Subscriber.objects.exists())
+
+    def test_posting_unsubscribes(self):
+        response = self.client.post(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Subscriber.objects.exists())
+
+    def test_unsubscribing_removes_the_pending_recipients(self):
+        campaign = Campaign.objects.create(subject="News")
+        newsletter.prepare(campaign)
+
+        self.client.post(self.url)
+
+        self.assertFalse(campaign.recipients.exists())
+
+    def test_tampered_token_is_rejected(self):
+        token = newsletter.make_unsubscribe_token('someone@example.com')
+        other_token = newsletter.make_unsubscribe_token('other@example.com')
+        tampered = [
+            token + 'x',
+            # Another address with this token's signature
+            other_token.partition(':')[0] + ':' + token.partition(':')[2],
+            'not-a-token',
+        ]
+        for tampered_token in tampered:
+            with self.subTest(token=tampered_token):
+                url = reverse('newsletter_unsubscribe', args=[tampered_token])
+
+                self.assertEqual(self.client.get(url).status_code, 404)
+                self.assertEqual(self.client.post(url).status_code, 404)
+        self.assertTrue(Subscriber.objects.exists())
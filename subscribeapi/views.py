@@ -1,10 +1,17 @@
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
+from .forms import SubscriberImportForm
 from .models import Subscriber
 from .serializers import SubscriberSerializer
+from . import newsletter, subscriber_csv
+from django.contrib import messages
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import render
 from django.utils import timezone
+from django.views.decorators.cache import never_cache
+from django.views.decorators.csrf import csrf_exempt
+from wagtail.admin.auth import permission_required
 import calendar
 
 
@@ -12,24 +19,59 @@ import calendar
 def subscribe(request):
     serializer = SubscriberSerializer(data=request.data)
     if serializer.is_valid():
-        email = serializer.validated_data['email']
-        
-        # Check if the email already exists
-        if Subscriber.objects.filter(email=email).exists():
-            return Response({"detail": "This email is already subscribed."}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Create the new subscriber if email doesn't exist
-        Subscriber.objects.create(email=email)
-        
+        # One statement, signing up twice (or twice at once) just says so
+        if not Subscriber.subscribe(serializer.validated_data['email']):
+            return Response({"email": serializer.validated_data['email'], "detail": "This email is already subscribed."}, status=status.HTTP_200_OK)
+
         # Optionally send a confirmation email here
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-def adminindex(request):
-    subscribers = Subscriber.objects.all()
+@csrf_exempt
+@never_cache
+def unsubscribe(request, token):
+    """
+    The unsubscribe link of the newsletter. Unsubscribing takes a POST, from
+    the page's button or from the mail client (List-Unsubscribe-Post), so
+    link scanners opening the link don't unsubscribe anyone. The signed
+    token stands in for a CSRF token.
+    """
+    email = newsletter.read_unsubscribe_token(token)
+    if email is None:
+        raise Http404
+    if request.method == 'POST':
+        Subscriber.unsubscribe(email)
+        return render(request, 'subscribeapi/unsubscribe.html', {'email': email, 'unsubscribed': True})
+    return render(request, 'subscribeapi/unsubscribe.html', {'email': email})
+
+
+@permission_required('subscribeapi.view_subscriber')
+def export_subscribers(request):
+    # Streamed as it is read from the database, whatever the number of subscribers
+    response = StreamingHttpResponse(subscriber_csv.export_rows(), content_type='text/csv')
+    filename = f"subscribers-{timezone.localdate():%Y-%m-%d}.csv"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@permission_required('subscribeapi.add_subscriber')
+def import_subscribers(request):
+    form = SubscriberImportForm(request.POST or None, request.FILES or None)
+    if request.method == 'POST' and form.is_valid():
+        result = subscriber_csv.import_csv(form.cleaned_data['file'])
+        message = f"{result.added} subscribers added, {result.existing} already subscribed"
+        if result.invalid:
+            messages.warning(request, f"{message}, {result.invalid} invalid lines skipped.")
+        else:
+            messages.success(request, f"{message}.")
+        return render(request, 'wagtailsubscribers/import.html', {
+            'form': SubscriberImportForm(),
+            'errors': result.errors,
+            'more_errors': result.invalid - len(result.errors),
+        })
 
-    return render(request, 'wagtailsubscribers/index.html', {
-        'subscribers': subscribers
+    return render(request, 'wagtailsubscribers/import.html', {
+        'form': form,
     })
@@ -0,0 +1,13 @@
+from django.urls import path
+from wagtail import hooks
+
+from .views import export_subscribers, import_subscribers
+
+
+@hooks.register('register_admin_urls')
+def register_subscriber_urls():
+    # Linked from the Subscribers listing (see SubscriberAdmin)
+    return [
+        path('subscribers/export/', export_subscribers, name='subscribers_export'),
+        path('subscribers/import/', import_subscribers, name='subscribers_import'),
+    ]